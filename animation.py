@@ -0,0 +1,69 @@
+import pygame
+
+from assets import ASSETS
+
+# Shared clock ticks per animation frame (0.1 s at 60 FPS)
+FRAME_TICKS = 6
+
+
+class AnimationClock:
+    """
+    Frame counter shared by all animated sprites
+    """
+
+    def __init__(self):
+        self.frame = 0
+
+    def tick(self):
+        self.frame += 1
+
+
+CLOCK = AnimationClock()
+
+
+class Animation:
+    """
+    Scaled frames of one sprite type with their masks, built once
+    """
+
+    def __init__(self, prefix: str, divider: int = 1):
+        self.frames = []
+        self.masks = []
+        for path in ASSETS.frames(prefix):
+            scale = None
+            if divider != 1:
+                width, height = ASSETS.image(path).get_size()
+                scale = (width // divider, height // divider)
+            self.frames.append(ASSETS.image(path, scale=scale))
+            self.masks.append(ASSETS.mask(path, scale=scale))
+        self.sizes = [frame.get_size() for frame in self.frames]
+        self.count = len(self.frames)
+
+    def index(self, start: int) -> int:
+        """
+        Returns number of frame for sprite animated since start tick
+        """
+        return (CLOCK.frame - start) // FRAME_TICKS % self.count
+
+    def apply(self, sprite: pygame.sprite.Sprite, index: int):
+        """
+        Sets image, mask and rect size of frame to sprite keeping its centerx
+        """
+        centerx = sprite.rect.centerx
+        sprite.image = self.frames[index]
+        sprite.mask = self.masks[index]
+        sprite.rect.size = self.sizes[index]
+        sprite.rect.centerx = centerx
+
+
+ANIMATIONS = {}
+
+
+def get_animation(prefix: str, divider: int = 1) -> Animation:
+    """
+    Returns shared animation table of sprite type
+    """
+    key = (prefix, divider)
+    if key not in ANIMATIONS:
+        ANIMATIONS[key] = Animation(prefix, divider)
+    return ANIMATIONS[key]
@@ -0,0 +1,177 @@
+import os
+import sys
+import threading
+
+import pygame
+
+
+def load_image(fullname: str) -> pygame.Surface:
+    """
+    Return a pygame.Surface (image) for sprites
+    """
+    if not os.path.isfile(fullname):
+        print(f"Файл с изображением '{fullname}' не найден")
+        sys.exit()
+    image = pygame.image.load(fullname)
+    return image
+
+
+def frame_key(name: str):
+    """
+    Sort key for animation frames: "2.png" goes before "10.png"
+    """
+    stem = os.path.splitext(name)[0]
+    return (0, int(stem), name) if stem.isdigit() else (1, 0, name)
+
+
+class AssetCache:
+    """
+    Process-wide store of decoded images and their masks.
+    Surfaces are keyed by path and transform and shared between sprites,
+    so sprites must never draw on them.
+    """
+
+    def __init__(self):
+        self.surfaces = {}
+        self.masks = {}
+        self.dirs = {}
+        self.decoded = {}  # Path -> image preloaded by other thread, not converted
+        # Guards decoded against images stored meanwhile by main thread
+        self.lock = threading.Lock()
+        self.atlas = None  # Packed sprites (atlas.Atlas), PNG files without it
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _convert(image: pygame.Surface, alpha=None) -> pygame.Surface:
+        """
+        Converts image to display format if window is already created
+        """
+        if pygame.display.get_surface() is None:
+            return image
+        if alpha is None:
+            alpha = image.get_flags() & pygame.SRCALPHA
+        if alpha:
+            return image.convert_alpha()
+        return image.convert()
+
+    def image(
+        self, path: str, flip=(False, False), scale=None, colorkey=None
+    ) -> pygame.Surface:
+        """
+        Returns cached (and transformed) image
+        """
+        key = (path, tuple(flip), tuple(scale) if scale else None, colorkey)
+        image = self.surfaces.get(key)
+        if image is not None:
+            self.hits += 1
+            return image
+        self.misses += 1
+        if key[1:] == ((False, False), None, None):
+            image, alpha = self.decoded.pop(path, None), None
+            if image is None and self.atlas is not None and path in self.atlas:
+                image, alpha = self.atlas.image(path)
+            elif image is None:
+                image = load_image(path)
+            image = self._convert(image, alpha)
+        else:
+            image = self.image(path)
+            if any(flip):
+                image = pygame.transform.flip(image, *flip)
+            if scale:
+                image = pygame.transform.scale(image, scale)
+            if colorkey is not None:
+                if image is self.surfaces[(path, (False, False), None, None)]:
+                    image = image.copy()
+                image.set_colorkey(colorkey)
+        with self.lock:
+            self.surfaces[key] = image
+            # Preloaded while image was loaded here, it would never be used
+            self.decoded.pop(path, None)
+        return image
+
+    def mask(
+        self, path: str, flip=(False, False), scale=None, colorkey=None
+    ) -> pygame.mask.Mask:
+        """
+        Returns cached collision mask of image with the same transform
+        """
+        key = (path, tuple(flip), tuple(scale) if scale else None, colorkey)
+        mask = self.masks.get(key)
+        if mask is not None:
+            self.hits += 1
+            return mask
+        self.misses += 1
+        if key[1:] == ((False, False), None, None) and (
+            self.atlas is not None and path in self.atlas
+        ):
+            mask = self.atlas.mask(path)
+        else:
+            mask = pygame.mask.from_surface(self.image(path, flip, scale, colorkey))
+        self.masks[key] = mask
+        return mask
+
+    def frames(self, prefix: str) -> list:
+        """
+        Returns sorted paths of animation frames in data/sprites/<prefix>
+        """
+        paths = self.dirs.get(prefix)
+        if paths is not None:
+            return paths
+        if self.atlas is not None and prefix in self.atlas.frames:
+            self.dirs[prefix] = self.atlas.frames[prefix]
+            return self.dirs[prefix]
+        folder = os.path.join("data/sprites", prefix)
+        paths = [
+            os.path.join(folder, name)
+            for name in sorted(os.listdir(folder), key=frame_key)
+            if os.path.isfile(os.path.join(folder, name))
+        ]
+        self.dirs[prefix] = paths
+        return paths
+
+    def preload(self, paths):
+        """
+        Decodes images ahead of first use (safe to call from loader thread).
+        They are converted to display format by image() on the main thread
+        """
+        for path in paths:
+            if (path, (False, False), None, None) in self.surfaces:
+                continue
+            if self.atlas is not None and path in self.atlas:
+                continue
+            if path in self.decoded:
+                continue
+            image = load_image(path)
+            with self.lock:  # Main thread may have loaded it meanwhile
+                if (path, (False, False), None, None) not in self.surfaces:
+                    self.decoded.setdefault(path, image)
+
+    def use_atlas(self, atlas):
+        """
+        Takes images, masks and frame order from atlas.Atlas
+        """
+        self.clear()
+        self.atlas = atlas
+
+    def stats(self) -> dict:
+        """
+        Returns cache hit/miss counters
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "surfaces": len(self.surfaces),
+            "masks": len(self.masks),
+        }
+
+    def clear(self):
+        self.surfaces.clear()
+        self.masks.clear()
+        self.dirs.clear()
+        self.decoded.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+ASSETS = AssetCache()
@@ -0,0 +1,189 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+from assets import frame_key
+
+ATLAS_PATH = "data/sprites.atlas"
+SOURCE = "data/sprites"
+MAGIC = b"FBATLAS2"
+HEADER = struct.Struct("<8sI")  # Magic and length of JSON index
+ALIGN = 16
+# Byte order of pixel blocks (tostring() and frombuffer() take it since
+# pygame 2.0)
+PIXEL_FORMAT = "RGBA"
+
+
+def padding(size: int) -> int:
+    return -size % ALIGN
+
+
+def sources(source=SOURCE) -> dict:
+    """
+    Returns modification time and size of every PNG image of source folder
+    """
+    found = {}
+    for folder, _, files in os.walk(source):
+        for name in files:
+            if name.endswith(".png"):
+                stat = os.stat(os.path.join(folder, name))
+                rel = os.path.relpath(os.path.join(folder, name), source)
+                found[rel.replace(os.sep, "/")] = [stat.st_mtime_ns, stat.st_size]
+    return found
+
+
+def build(source=SOURCE, path=ATLAS_PATH) -> dict:
+    """
+    Packs PNG images of source folder into one file and returns its index.
+
+    File is header, JSON index and aligned blocks of raw pixels (RGBA) and
+    collision masks (one byte per pixel, 0 is empty). Index maps image path
+    to its size and blocks, folder to its frames in animation order and
+    source image to its modification time and size (to notice changes)
+    """
+    images = {}
+    frames = {}
+    blocks = []
+    offset = 0
+    for folder, dirs, files in os.walk(source):
+        dirs.sort()
+        prefix = os.path.relpath(folder, source).replace(os.sep, "/")
+        names = sorted((name for name in files if name.endswith(".png")), key=frame_key)
+        if names and prefix != ".":
+            frames[prefix] = [f"{source}/{prefix}/{name}" for name in names]
+        for name in names:
+            image = pygame.image.load(os.path.join(folder, name))
+            colorkey = image.get_colorkey()
+            alpha = bool(image.get_flags() & pygame.SRCALPHA)
+            # 32-bit copy which keeps colorkey (it blits faster than alpha).
+            # Like after convert(), every pixel of colorkey color is
+            # transparent, not only the keyed palette entry
+            pixels = pygame.Surface(image.get_size(), pygame.SRCALPHA, 32)
+            image.set_colorkey(None)
+            pixels.blit(image, (0, 0))
+            image.set_colorkey(colorkey)
+            if colorkey is not None:
+                pixels.set_colorkey(colorkey)
+            plane = pygame.mask.from_surface(pixels).to_surface(
+                setcolor=(255, 255, 255, 255), unsetcolor=(0, 0, 0, 255)
+            )
+            entry = {
+                "width": image.get_width(),
+                "height": image.get_height(),
+                "alpha": alpha,
+                "colorkey": colorkey and list(colorkey),
+            }
+            for block, data in (
+                ("pixels", pygame.image.tostring(pixels, PIXEL_FORMAT)),
+                ("mask", pygame.image.tostring(plane, "RGBA")[::4]),
+            ):
+                entry[block] = offset
+                blocks.append(data + bytes(padding(len(data))))
+                offset += len(blocks[-1])
+            rel = os.path.relpath(os.path.join(folder, name), source)
+            images[f"{source}/{rel.replace(os.sep, '/')}"] = entry
+
+    index = {"images": images, "frames": frames, "sources": sources(source)}
+    data = json.dumps(index).encode()
+    header = HEADER.pack(MAGIC, len(data))
+    with open(path + ".tmp", "wb") as f:
+        f.write(header + data + bytes(padding(len(header) + len(data))))
+        f.writelines(blocks)
+    os.replace(path + ".tmp", path)
+    return index
+
+
+class Atlas:
+    """
+    Atlas file built by build() and mapped into memory.
+    Surfaces and masks are made from views of the mapping without decoding
+    PNG files. Mapping is copy-on-write, so file is never changed
+    """
+
+    def __init__(self, path=ATLAS_PATH):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, length = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a sprite atlas")
+        index = json.loads(self.map[HEADER.size : HEADER.size + length])
+        self.images = index["images"]
+        self.frames = index["frames"]
+        self.sources = index["sources"]
+        self.start = HEADER.size + length + padding(HEADER.size + length)
+        self.view = memoryview(self.map)
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+
+    def __contains__(self, path: str) -> bool:
+        return path.replace(os.sep, "/") in self.images
+
+    def _view(self, path: str, block: str, depth: int) -> tuple:
+        entry = self.images[path.replace(os.sep, "/")]
+        size = (entry["width"], entry["height"])
+        start = self.start + entry[block]
+        return self.view[start : start + size[0] * size[1] * depth], size, entry
+
+    def image(self, path: str) -> tuple:
+        """
+        Returns surface over pixels of image and whether it has transparency
+        """
+        data, size, entry = self._view(path, "pixels", 4)
+        image = pygame.image.frombuffer(data, size, PIXEL_FORMAT)
+        if entry["colorkey"] is not None:
+            image.set_colorkey(entry["colorkey"])
+        return image, entry["alpha"]
+
+    def mask(self, path: str) -> pygame.mask.Mask:
+        """
+        Returns collision mask of image from its prebuilt plane
+        """
+        data, size, _ = self._view(path, "mask", 1)
+        plane = pygame.image.frombuffer(data, size, "P")
+        plane.set_colorkey(0)
+        return pygame.mask.from_surface(plane)
+
+
+def load_atlas(path=ATLAS_PATH, source=SOURCE):
+    """
+    Returns Atlas if it was built, otherwise None (PNG files are used).
+    Atlas is rebuilt if images of source folder were changed after it or
+    it was built by older version
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        atlas = Atlas(path)
+    except ValueError:
+        atlas = None
+    if not os.path.isdir(source):
+        return atlas
+    if atlas is None or atlas.sources != sources(source):
+        if atlas is not None:
+            atlas.close()
+        build(source, path)
+        print(f"Спрайты изменены, атлас '{path}' пересобран")
+        atlas = Atlas(path)
+    return atlas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build sprite atlas")
+    parser.add_argument("--source", default=SOURCE)
+    parser.add_argument("--output", default=ATLAS_PATH)
+    args = parser.parse_args()
+    index = build(args.source, args.output)
+    print(
+        f"{len(index['images'])} images in {len(index['frames'])} folders, "
+        f"{os.path.getsize(args.output) // 1024} KiB -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
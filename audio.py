@@ -0,0 +1,181 @@
+import queue
+import threading
+import time
+from array import array
+
+import pygame
+
+FREQUENCY = 44100
+# Samples in mixer buffer: sound starts at most this long after play()
+# (pygame default is 512, smaller buffers need more wakeups of audio thread)
+BUFFER = 256
+# Category -> sounds and channels reserved for them, so crash or coin
+# sounds never take the channel of flap
+CATEGORIES = {
+    "flap": (("wing",), 2),
+    "score": (("point",), 1),
+    "coin": (("collect_coin",), 2),
+    "crash": (("hit", "die"), 2),
+    "ui": (("swoosh", "bought"), 1),
+}
+FREE_CHANNELS = 4  # Channels left for sounds without category
+
+
+def pre_init(buffer=BUFFER):
+    """
+    Sets mixer parameters, must be called before pygame.init()
+    """
+    pygame.mixer.pre_init(FREQUENCY, -16, 2, buffer)
+
+
+class AudioManager:
+    """
+    Plays sounds on channels reserved per category. Sounds triggered during
+    a frame are played together by flush(): the same sound is played once
+    and a category plays at most as many sounds as it has channels.
+    With threaded = True sounds are played by a background thread
+    """
+
+    def __init__(self, sounds, buffer=BUFFER, threaded=False, size=256):
+        if buffer != BUFFER:  # Mixer was started with BUFFER by pre_init()
+            pygame.mixer.quit()
+            pre_init(buffer)
+            pygame.mixer.init()
+        self.sounds = sounds
+        self.buffer = buffer
+        self.categories = {}  # Sound name -> category
+        self.channels = {}  # Category -> reserved channels
+        self.stolen_next = {}  # Category -> index of channel to take if all busy
+        self.reserve()
+        self.requested = {}  # Sound name -> time of its first trigger in frame
+        self.queue = None
+        self.thread = None
+        if threaded:
+            self.queue = queue.SimpleQueue()
+            self.thread = threading.Thread(target=self._run, name="audio")
+            self.thread.daemon = True
+            self.thread.start()
+        # Trigger to output times of last size sounds (ring buffer)
+        self.latencies = array("d", [0.0]) * size
+        self.index = 0
+        self.triggered = 0
+        self.played = 0
+        self.coalesced = 0  # Triggers of sound already triggered in frame
+        self.dropped = 0  # Sounds over channels of category in frame
+        self.stolen = 0  # Sounds which stopped another sound of category
+
+    def reserve(self):
+        reserved = sum(count for _, count in CATEGORIES.values())
+        pygame.mixer.set_num_channels(reserved + FREE_CHANNELS)
+        pygame.mixer.set_reserved(reserved)
+        first = 0
+        for category, (names, count) in CATEGORIES.items():
+            for name in names:
+                self.categories[name] = category
+            self.channels[category] = [
+                pygame.mixer.Channel(i) for i in range(first, first + count)
+            ]
+            self.stolen_next[category] = 0
+            first += count
+
+    @property
+    def output_delay(self) -> float:
+        """
+        Seconds from play() to output (one mixer buffer, SDL does not tell
+        when samples are really played)
+        """
+        return self.buffer / FREQUENCY
+
+    def trigger(self, name: str, at=None):
+        """
+        Requests sound for the end of frame. at is time of its cause
+        (time.perf_counter(), now by default), latency is counted from it
+        """
+        self.triggered += 1
+        if name in self.requested:
+            self.coalesced += 1
+            return
+        self.requested[name] = time.perf_counter() if at is None else at
+
+    def flush(self):
+        """
+        Plays sounds triggered since the last flush
+        """
+        if not self.requested:
+            return
+        requests, self.requested = self.requested, {}
+        if self.queue is not None:
+            self.queue.put(requests)
+        else:
+            self.play(requests)
+
+    def play(self, requests: dict):
+        busy = {}  # Category -> sounds played now
+        for name, at in requests.items():
+            category = self.categories.get(name)
+            if category is None:
+                self.sounds[name].play()
+            else:
+                channels = self.channels[category]
+                count = busy.get(category, 0)
+                if count >= len(channels):
+                    self.dropped += 1
+                    continue
+                busy[category] = count + 1
+                self.channel(category).play(self.sounds[name])
+            self.played += 1
+            latency = time.perf_counter() - at + self.output_delay
+            self.latencies[self.index % len(self.latencies)] = latency
+            self.index += 1
+
+    def channel(self, category: str) -> pygame.mixer.Channel:
+        """
+        Returns free channel of category, if all are busy takes them in turn
+        """
+        channels = self.channels[category]
+        for channel in channels:
+            if not channel.get_busy():
+                return channel
+        self.stolen += 1
+        index = self.stolen_next[category]
+        self.stolen_next[category] = (index + 1) % len(channels)
+        return channels[index]
+
+    def _run(self):
+        while True:
+            requests = self.queue.get()
+            if requests is None:
+                break
+            self.play(requests)
+
+    def close(self):
+        """
+        Plays what is left and stops background thread
+        """
+        self.flush()
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def latency(self, q: float) -> float:
+        """
+        Returns q-th part (0..1) of trigger to output latency in seconds
+        """
+        count = min(self.index, len(self.latencies))
+        if not count:
+            return 0.0
+        latencies = sorted(self.latencies[:count])
+        return latencies[min(count - 1, int(q * count))]
+
+    def stats(self) -> dict:
+        return {
+            "triggered": self.triggered,
+            "played": self.played,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "stolen": self.stolen,
+            "buffer_ms": self.output_delay * 1000,
+            "latency_p50_ms": self.latency(0.5) * 1000,
+            "latency_p99_ms": self.latency(0.99) * 1000,
+        }
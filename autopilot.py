@@ -0,0 +1,381 @@
+import argparse
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from itertools import chain
+
+from simulation import (
+    BIRD_HEIGHT,
+    BIRD_WIDTH,
+    BIRD_X,
+    GRAVITY,
+    GROUND_Y,
+    JUMP_VELOCITY,
+    PIPE_WIDTH,
+    SCORE_X,
+    World,
+)
+
+HORIZON = 120  # Frames planned ahead
+BUDGET = 0.0005  # Seconds of search per frame
+MARGIN = 2  # Pixels kept from pipes, ground and ceiling
+# Frames of a plan followed before search of the next one starts
+REPLAN_AFTER = 10
+# Next plan starts this many frames ahead on the current plan, so its
+# search may take that many frames of budget
+LEAD = 50
+BRANCHES = 8  # Jumps tried after every jump
+TIMES = 1024  # Last calls kept for percentile of planning time
+
+
+@lru_cache(maxsize=512)
+def trajectory(velocity: float, frames=HORIZON) -> tuple:
+    """
+    Returns how much bird rises after every frame without jumps
+    (the same float steps as World.step, ceiling is avoided by planner)
+    """
+    rise = 0.0
+    rises = []
+    for _ in range(frames):
+        velocity -= GRAVITY
+        rise += velocity
+        rises.append(rise)
+    return tuple(rises)
+
+
+# Rise after a jump (planner always jumps with this velocity)
+JUMP = trajectory(JUMP_VELOCITY)
+JUMP_LIFT = max(JUMP)
+
+
+class Autopilot:
+    """
+    Plays World: searches frames to jump at over the next HORIZON frames.
+    Between two jumps bird moves by precomputed trajectory, so only jumps
+    are searched, and jumps which crash are remembered by frame and height
+    for the whole game. Search of the next plan starts LEAD frames ahead on
+    the current safe plan and goes on for BUDGET every frame until it is
+    found, bird follows the current plan meanwhile. Only when no safe plan
+    is left bird follows the branch which survived longest for one frame
+    """
+
+    def __init__(self, budget=BUDGET, horizon=HORIZON):
+        self.budget = budget
+        self.horizon = horizon
+        self.jumps = set()  # World frames to jump at
+        self.expected = {}  # World frame -> planned bird height
+        self.safe = -1  # Plan is known to pass until this frame
+        self.until = -1  # Search of the next plan starts at this frame
+        # World frame -> heights of jumps which crash whatever is done after
+        # them, true for later plans too (new pipes only add limits)
+        self.dead = {}
+        self.course = None  # Course and frame of the last call
+        self.frame = 0
+        self.search = None  # Paused search of the next plan
+        self.root = -1  # Frame where the searched plan starts
+        # Frames between now and root, less after failed search (current
+        # plan may lead where no way is left)
+        self.lead = LEAD
+        self.path = []  # Jumps of searched branch
+        self.best = [0, []]  # Frames survived and jumps of the longest branch
+        self.deadline = 0.0
+        self.plans = 0
+        self.failed = 0  # Searches which found no safe way
+        self.over_budget = 0  # Frames when search was paused
+        self.fallbacks = 0  # Frames flown without safe plan
+        self.searched = 0
+        self.memo_hits = 0
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.times = array("d", [0.0]) * TIMES  # Ring buffer of call times
+
+    def __call__(self, world: World) -> bool:
+        """
+        Returns whether bird should jump before the next step
+        """
+        start = time.perf_counter()
+        frame = world.frame
+        self.forget(world)
+        if self.expected.get(frame) != world.bird_y:  # Plan was not followed
+            self.jumps.clear()
+            self.safe = frame
+            self.search = None
+        if self.search is not None and frame > self.root:  # Too late for it
+            self.search = None
+        if self.search is None and frame >= min(self.until, self.safe):
+            self.start_search(world)
+        if self.search is not None:
+            self.resume(world, start + self.budget)
+        if frame >= self.safe:  # Follow the longest branch for one frame
+            self.fallbacks += 1
+            self.jumps = {at for at in self.best[1] if at == frame}
+            self.search = None
+            self.expected = self.predict(world, frame + 1)
+
+        elapsed = time.perf_counter() - start
+        self.times[self.calls % TIMES] = elapsed
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        return frame in self.jumps
+
+    def forget(self, world: World):
+        """
+        Drops remembered crashes of passed frames (all of them and the plan
+        in new game)
+        """
+        frame = world.frame
+        course = (id(world.course), world.course.seed)
+        if course != self.course or frame < self.frame:
+            self.dead.clear()
+            self.jumps.clear()
+            self.expected = {}
+            self.safe = self.until = -1
+            self.search = None  # It was searched on the previous course
+            self.lead = LEAD
+        else:
+            for passed in range(self.frame, frame):
+                self.dead.pop(passed, None)
+        self.course, self.frame = course, frame
+
+    def distances(self, world: World, frames: int) -> list:
+        """
+        Returns distance pipes move after every frame (speed changes when
+        pipe gives a point, as in World.step)
+        """
+        waiting = [pipe for pipe in world.pipes if not pipe.used]
+        speed = world.ahead
+        moved = 0.0
+        distances = [moved]
+        for _ in range(frames):
+            scored = False
+            while waiting and waiting[0].x - moved < SCORE_X:
+                waiting.pop(0)
+                scored = True
+            moved += speed
+            distances.append(moved)
+            if scored and waiting:
+                speed = waiting[0].speed
+        return distances
+
+    def envelope(self, world: World, offset: int) -> list:
+        """
+        Returns allowed (lowest, highest) bird top after every planned frame
+        of plan which starts offset frames from now
+        """
+        frames = offset + self.horizon
+        low = MARGIN
+        high = GROUND_Y - BIRD_HEIGHT - MARGIN
+        bounds = [(low, high)] * (frames + 1)
+        distances = self.distances(world, frames)
+        for pipe in world.pipes:
+            # Frames when pipe overlaps bird by x
+            first = bisect_right(distances, pipe.x - BIRD_X - BIRD_WIDTH - MARGIN)
+            last = bisect_left(distances, pipe.x + PIPE_WIDTH + MARGIN - BIRD_X) - 1
+            if last < 1 or first > frames:
+                continue
+            top = pipe.gap_y - pipe.skylight + MARGIN
+            bottom = pipe.gap_y - BIRD_HEIGHT - MARGIN
+            for step in range(max(first, 1), min(last, frames) + 1):
+                low, high = bounds[step]
+                bounds[step] = (max(low, top), min(high, bottom))
+        return bounds[offset:]
+
+    @staticmethod
+    def targets(bounds: list) -> list:
+        """
+        Returns height to jump at for every frame: a bit below middle of
+        the next gap (jump lifts bird by about JUMP_LIFT pixels)
+        """
+        free = bounds[0]
+        target = (free[0] + free[1]) / 2
+        targets = [target] * len(bounds)
+        for step in range(len(bounds) - 1, -1, -1):
+            low, high = bounds[step]
+            if (low, high) != free:
+                target = (low + high) / 2 + JUMP_LIFT / 2
+            targets[step] = target
+        return targets
+
+    def advance(self, world: World, until: int) -> tuple:
+        """
+        Returns bird height and velocity at frame until on current plan
+        """
+        y_pos, velocity = world.bird_y, world.velocity
+        for frame in range(world.frame, until):
+            if frame in self.jumps:
+                velocity = JUMP_VELOCITY
+            velocity -= GRAVITY
+            y_pos -= velocity
+        return y_pos, velocity
+
+    def start_search(self, world: World):
+        """
+        Starts search of plan from lead frames ahead on current plan (from
+        now if current plan is not safe that far)
+        """
+        frame = world.frame
+        self.root = frame + min(self.lead, max(0, self.safe - frame))
+        y_pos, velocity = self.advance(world, self.root)
+        bounds = self.envelope(world, self.root - frame)
+        self.path = []
+        self.best = [0, []]
+        self.search = self.explore(bounds, y_pos, trajectory(round(velocity, 6)))
+
+    def resume(self, world: World, deadline: float):
+        """
+        Searches until deadline, takes plan if search ends with it
+        """
+        self.deadline = deadline
+        try:
+            next(self.search)
+        except StopIteration as stop:
+            self.search = None
+            if stop.value:
+                self.take_plan(world)
+                self.lead = LEAD
+            else:
+                self.failed += 1
+                self.lead //= 2
+        else:
+            self.over_budget += 1
+
+    def take_plan(self, world: World):
+        frame = world.frame
+        self.jumps = {at for at in self.jumps if at < self.root}
+        self.jumps.update(self.path)
+        self.safe = self.root + self.horizon
+        self.until = frame + REPLAN_AFTER
+        self.expected = self.predict(world, self.safe)
+        self.plans += 1
+
+    def explore(self, bounds: list, y_pos: float, rises: tuple):
+        """
+        Generator which finds jumps into self.path (World frames), yields
+        when time is over and returns whether safe way is found
+        """
+        root = self.root
+        targets = self.targets(bounds)
+        dead = self.dead
+        horizon = self.horizon
+        path = self.path
+        best = self.best
+
+        def fall(step, y_pos, rises):
+            """
+            Returns heights of bird falling from step while it is in bounds
+            """
+            heights = []
+            for rise in rises[: horizon - step]:
+                y_pos_next = y_pos - rise
+                step += 1
+                low, high = bounds[step]
+                if not low <= y_pos_next <= high:
+                    break
+                heights.append(y_pos_next)
+            return heights
+
+        def search(step, y_pos, rises, first=0):
+            """
+            Finds jumps after step, False if bird crashes.
+            The next jump is at least first frames after step
+            """
+            heights = fall(step, y_pos, rises)
+            if step + len(heights) >= horizon:
+                return True
+            if step + len(heights) > best[0]:
+                best[:] = step + len(heights), list(path)
+            heights.insert(0, y_pos)
+            # Jump when bird falls to target height first, then the jumps
+            # around it
+            count = len(heights)
+            if count <= first:
+                return False
+            center = count - 1
+            for delay in range(first, count):
+                if heights[delay] >= targets[step + delay]:
+                    center = delay
+                    break
+            after = range(center, min(count, center + BRANCHES))
+            before = range(center - 1, max(first, center - BRANCHES) - 1, -1)
+            for delay in chain(after, before):
+                at = root + step + delay
+                height = heights[delay]
+                heights_dead = dead.get(at)
+                if heights_dead is not None and int(height) in heights_dead:
+                    self.memo_hits += 1
+                    continue
+                if time.perf_counter() > self.deadline:
+                    yield  # Goes on in the next frame
+                self.searched += 1
+                path.append(at)
+                if (yield from search(step + delay, height, JUMP, 1)):
+                    return True
+                path.pop()
+                dead.setdefault(at, set()).add(int(height))
+            return False
+
+        return (yield from search(0, y_pos, rises))
+
+    def predict(self, world: World, until: int) -> dict:
+        """
+        Returns bird heights at frames of plan (to notice other moves)
+        """
+        y_pos, velocity = world.bird_y, world.velocity
+        expected = {world.frame: y_pos}
+        for frame in range(world.frame, until):
+            if frame in self.jumps:
+                velocity = JUMP_VELOCITY
+            velocity -= GRAVITY
+            y_pos -= velocity
+            expected[frame + 1] = y_pos
+        return expected
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns q-th part (0..1) of time of the last TIMES calls in seconds
+        """
+        count = min(self.calls, TIMES)
+        if not count:
+            return 0.0
+        times = sorted(self.times[:count])
+        return times[min(count - 1, int(q * count))]
+
+    def stats(self) -> dict:
+        return {
+            "plans": self.plans,
+            "failed": self.failed,
+            "over_budget": self.over_budget,
+            "fallbacks": self.fallbacks,
+            "searched": self.searched,
+            "memo_hits": self.memo_hits,
+            "mean_ms": self.total_time / max(self.calls, 1) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max_time * 1000,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autopilot on headless courses")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=20000, help="limit per game")
+    parser.add_argument("--curve", default="classic")
+    parser.add_argument("--budget", type=float, default=BUDGET * 1000, help="ms")
+    args = parser.parse_args()
+
+    autopilot = Autopilot(args.budget / 1000)
+    world = World(curve=args.curve)
+    start = time.perf_counter()
+    for game in range(args.games):
+        world.reset(game)
+        while world.alive and world.frame < args.frames:
+            world.step(autopilot(world))
+        print(f"seed {game}: score {world.score}, {world.frame} frames")
+    seconds = time.perf_counter() - start
+    print(autopilot.stats(), f"{seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
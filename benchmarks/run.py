@@ -0,0 +1,351 @@
+"""
+Headless benchmarks of Flappy Bird.
+
+Every scenario runs in its own process with dummy SDL video and audio
+drivers and seeded random, so results are comparable between runs:
+
+    python benchmarks/run.py                 # run all, compare to baseline
+    python benchmarks/run.py game stress     # run some scenarios
+    python benchmarks/run.py --save          # store results as new baseline
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+SCENARIOS = {}
+
+
+def scenario(name, frames):
+    """
+    Registers benchmark function
+    """
+
+    def register(func):
+        SCENARIOS[name] = (func, frames)
+        return func
+
+    return register
+
+
+def peak_rss() -> int:
+    """
+    Returns peak resident memory of process in KiB (None on Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def prepare():
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+
+def temp_save() -> str:
+    """
+    Returns path of save file outside of data folder
+    """
+    return os.path.join(tempfile.mkdtemp(), "save.json")
+
+
+def temp_history() -> str:
+    """
+    Returns path of run history outside of data folder
+    """
+    return os.path.join(tempfile.mkdtemp(), "history.db")
+
+
+def new_game(seed, frames, **kwargs):
+    """
+    Returns main module and seeded GameHandler which profiles every frame
+    """
+    import main
+    from profiler import FrameProfiler
+
+    random.seed(seed)
+    game = main.GameHandler(
+        save_path=temp_save(), history_path=temp_history(), **kwargs
+    )
+    game.profiler = FrameProfiler(max(frames, 1))
+    game.renderer.profiler = game.profiler
+    game.hud.profiler = game.profiler
+    return main, game
+
+
+def press_space():
+    import pygame
+
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE))
+
+
+def play(main, game, frames, policy=None):
+    """
+    Plays frames, starts new game from menu, jumps when policy says so
+    """
+    for _ in range(frames):
+        if game.game_mode == "MENU":
+            press_space()
+        elif game.game_mode == "GAME" and policy is not None and policy(game.world):
+            press_space()
+        game.frame(main.TICK)
+
+
+@scenario("menu", 600)
+def bench_menu(seed, frames, dirty_rects=False):
+    main, game = new_game(seed, frames, dirty_rects=dirty_rects)
+    for n in range(frames):
+        if n % 60 == 0:  # Slide texts in again
+            game.title.renew()
+            game.get_ready.renew()
+            game.button_shop.renew()
+        game.frame(main.TICK)
+    return game
+
+
+@scenario("menu_dirty", 600)
+def bench_menu_dirty(seed, frames):
+    return bench_menu(seed, frames, dirty_rects=True)
+
+
+@scenario("shop", 600)
+def bench_shop(seed, frames):
+    main, game = new_game(seed, frames)
+    main.bird.rect.x = -100
+    game.game_mode = "SHOP"
+    for n in range(frames):
+        if n % 60 == 0:
+            game.bird_yellow_button.renew()
+            game.bird_blue_button.renew()
+            game.bird_red_button.renew()
+        game.frame(main.TICK)
+    return game
+
+
+@scenario("game", 3000)
+def bench_game(seed, frames):
+    from runner import ThresholdPolicy
+
+    main, game = new_game(seed, frames)
+    play(main, game, frames, ThresholdPolicy())
+    return game
+
+
+@scenario("over", 3000)
+def bench_over(seed, frames):
+    main, game = new_game(seed, frames)
+    play(main, game, frames)  # Bird falls, game over screen, again
+    return game
+
+
+@scenario("stress", 3000)
+def bench_stress(seed, frames):
+    from course import Difficulty
+    from runner import ThresholdPolicy
+    from simulation import World
+
+    main, game = new_game(seed, frames)
+    # Pipe every 60 pixels and coin in every gap
+    game.world = World(
+        seed, collide=False, curve=lambda index: Difficulty(spacing=60, coin_chance=1)
+    )
+    play(main, game, frames, ThresholdPolicy())
+    return game
+
+
+@scenario("long", 30000)
+def bench_long(seed, frames):
+    from runner import ThresholdPolicy
+
+    main, game = new_game(seed, frames)
+    play(main, game, frames, ThresholdPolicy())
+    return game
+
+
+@scenario("long_headless", 0)
+def bench_long_headless(seed, frames, pipes=10000):
+    """
+    World without collisions until 10k pipes are passed
+    """
+    from simulation import World
+
+    world = World(seed, collide=False)
+    while world.score < pipes:
+        world.step()
+    return world
+
+
+def run_child(name, seed, alloc) -> dict:
+    """
+    Runs scenario in this process and returns its metrics
+    """
+    prepare()
+    func, frames = SCENARIOS[name]
+    if name == "startup":
+        return bench_startup()
+
+    import main  # noqa: F401 (imports are not counted as allocations)
+    import runner  # noqa: F401
+
+    if alloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func(seed, frames)
+    seconds = time.perf_counter() - start
+    metrics = {"seconds": seconds, "rss_peak_kib": peak_rss()}
+    if alloc:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {"alloc_net_kib": current // 1024, "alloc_peak_kib": peak // 1024}
+
+    if hasattr(result, "profiler"):
+        rows = result.profiler.rows()
+        metrics["frames"] = len(rows)
+        metrics["fps"] = len(rows) / seconds
+        for phase in ("events", "update", "draw", "score", "present"):
+            metrics[f"{phase}_ms"] = sum(row[phase] for row in rows) / len(rows) * 1000
+        # Sprites made by pools, stays flat in long runs if they are reused
+        metrics["pool_created"] = sum(
+            pool["created"] for pool in main.pool_stats().values()
+        )
+        # Time from reading input to present of frame which shows it
+        metrics["input_p99_ms"] = (
+            result.profiler.input_histogram.percentile(0.99) * 1000
+        )
+        # Trigger to output time of sounds (mixer buffer included)
+        audio = result.audio.stats()
+        metrics["sound_p50_ms"] = audio["latency_p50_ms"]
+        metrics["sound_p99_ms"] = audio["latency_p99_ms"]
+    else:
+        metrics["frames"] = result.frame
+        metrics["fps"] = result.frame / seconds
+    return metrics
+
+
+def bench_startup() -> dict:
+    """
+    Time from import of main to the first drawn frame and to loaded assets
+    """
+    start = time.perf_counter()
+    import main
+
+    game = main.GameHandler(save_path=temp_save(), history_path=temp_history())
+    game.frame(0)
+    seconds = time.perf_counter() - start
+    main.LOADER.wait()
+    return {
+        "seconds": seconds,
+        "loaded_seconds": time.perf_counter() - start,
+        "rss_peak_kib": peak_rss(),
+    }
+
+
+SCENARIOS["startup"] = (bench_startup, 1)
+
+
+def run_scenario(name, seed, alloc) -> dict:
+    """
+    Runs scenario in new process (module state and peak memory are per run)
+    """
+    command = [sys.executable, __file__, "--child", name, "--seed", str(seed)]
+    start = time.perf_counter()
+    output = subprocess.run(command, check=True, capture_output=True, text=True)
+    metrics = json.loads(output.stdout.splitlines()[-1])
+    if name == "startup":
+        metrics["process_seconds"] = time.perf_counter() - start
+    if alloc and name != "startup":
+        output = subprocess.run(
+            command + ["--alloc"], check=True, capture_output=True, text=True
+        )
+        metrics.update(json.loads(output.stdout.splitlines()[-1]))
+    return metrics
+
+
+def compare(results, baseline, tolerance) -> list:
+    """
+    Prints results next to baseline, returns names of slower scenarios
+    """
+    slower = []
+    # Value is frames per second or startup time in seconds
+    print(f"{'scenario':<14}{'value':>12}{'baseline':>12}{'change':>9}{'seconds':>10}")
+    for name, metrics in results.items():
+        old = baseline.get(name, {})
+        if "fps" in metrics:
+            value, old_value = metrics["fps"], old.get("fps")
+            change = value / old_value - 1 if old_value else None
+            worse = change is not None and change < -tolerance
+        else:  # Startup time, lower is better
+            value, old_value = metrics["seconds"], old.get("seconds")
+            change = 1 - value / old_value if old_value else None
+            worse = change is not None and change < -tolerance
+        line = f"{name:<14}{value:>12.1f}"
+        line += f"{old_value:>12.1f}" if old_value else f"{'-':>12}"
+        line += f"{change:>+9.1%}" if change is not None else f"{'-':>9}"
+        line += f"{metrics['seconds']:>10.2f}"
+        print(line + ("  SLOWER" if worse else ""))
+        if worse:
+            slower.append(name)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flappy Bird benchmarks")
+    parser.add_argument("scenarios", nargs="*", help="default: all")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="overwrite baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="allowed slowdown (0.1 = 10%%)"
+    )
+    parser.add_argument("--no-alloc", action="store_true", help="skip tracemalloc runs")
+    parser.add_argument("--json", help="save results to file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--alloc", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.seed, args.alloc)))
+        return
+
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario '{name}', choose from {list(SCENARIOS)}")
+    results = {}
+    for name in names:
+        results[name] = run_scenario(name, args.seed, not args.no_alloc)
+        print(name, json.dumps(results[name]), flush=True)
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    slower = compare(results, baseline, args.tolerance)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+    if slower and not args.save:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+import pygame
+
+FORMATS = ("raw", "png", "delta")
+SLOTS = 8  # Preallocated frame buffers
+# Every KEYFRAME-th frame of delta video is stored whole (to start playing
+# from it)
+KEYFRAME = 60
+MAGIC = b"FBV1"
+# Magic, format, width, height, pitch and color masks of frames
+HEADER = struct.Struct("<4sB3H4I")
+# Frame number, seconds since start, keyframe and length of data
+FRAME = struct.Struct("<IdBI")
+
+
+class FrameCapture:
+    """
+    Records frames of a surface. grab() copies surface into a free buffer
+    of a preallocated ring and returns at once, a writer thread writes
+    buffers to path. When all buffers wait for writer the frame is dropped
+    """
+
+    def __init__(self, path: str, surface: pygame.Surface, fmt="raw", slots=SLOTS):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown capture format '{fmt}'")
+        self.path = path
+        self.fmt = fmt
+        self.size = surface.get_size()
+        self.pitch = surface.get_pitch()
+        self.masks = surface.get_masks()
+        frame_size = self.pitch * self.size[1]
+        self.buffers = [bytearray(frame_size) for _ in range(slots)]
+        self.free = deque(range(slots))  # Buffers which may be filled
+        self.queue = queue.SimpleQueue()  # (buffer, frame, time) to write
+        self.start = time.perf_counter()
+        self.frame = 0
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        if fmt == "png":
+            os.makedirs(path, exist_ok=True)
+            self.file = None
+        else:
+            self.file = open(path, "wb")
+            self.file.write(
+                HEADER.pack(
+                    MAGIC, FORMATS.index(fmt), *self.size, self.pitch, *self.masks
+                )
+            )
+        self.previous = bytearray(frame_size)  # Last written frame (delta)
+        self.thread = threading.Thread(target=self._run, name="capture")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def grab(self, surface: pygame.Surface) -> bool:
+        """
+        Copies surface for writing, False if the frame is dropped
+        """
+        self.frame += 1
+        if not self.free or self.error is not None:
+            self.dropped += 1
+            return False
+        slot = self.free.popleft()
+        view = surface.get_view("0")  # Surface is locked while view lives
+        with memoryview(view) as pixels:
+            self.buffers[slot][:] = pixels
+        del view
+        self.captured += 1
+        self.queue.put((slot, self.frame, time.perf_counter() - self.start))
+        return True
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            slot, frame, seconds = item
+            try:
+                if self.error is None:
+                    self.write(self.buffers[slot], frame, seconds)
+            except (OSError, pygame.error) as error:  # Game goes on
+                self.error = error
+            self.free.append(slot)
+
+    def write(self, pixels: bytearray, frame: int, seconds: float):
+        if self.fmt == "png":
+            image = pygame.Surface(self.size, 0, 32, self.masks)
+            image.get_buffer().write(bytes(pixels))
+            pygame.image.save(image, os.path.join(self.path, f"{frame:06}.png"))
+        elif self.fmt == "raw":
+            self.file.write(FRAME.pack(frame, seconds, True, len(pixels)))
+            self.file.write(pixels)
+        else:
+            keyframe = self.written % KEYFRAME == 0
+            data = np.frombuffer(pixels, np.uint8)
+            if not keyframe:  # Changed bytes only, the rest are zeros
+                data = data ^ np.frombuffer(self.previous, np.uint8)
+            compressed = zlib.compress(data.tobytes(), 1)
+            self.file.write(FRAME.pack(frame, seconds, keyframe, len(compressed)))
+            self.file.write(compressed)
+            self.previous[:] = pixels
+        self.written += 1
+
+    def close(self):
+        """
+        Writes grabbed frames and stops writer thread
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frame,
+            "captured": self.captured,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+def read(path: str):
+    """
+    Yields (frame, seconds, surface) of raw or delta video
+    """
+    with open(path, "rb") as f:
+        magic, fmt, width, height, pitch, *masks = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a captured video")
+        image = pygame.Surface((width, height), 0, 32, masks)
+        previous = np.zeros(pitch * height, np.uint8)
+        while True:
+            header = f.read(FRAME.size)
+            if len(header) < FRAME.size:
+                return
+            frame, seconds, keyframe, length = FRAME.unpack(header)
+            data = f.read(length)
+            if FORMATS[fmt] == "delta":
+                data = np.frombuffer(zlib.decompress(data), np.uint8)
+                if not keyframe:
+                    data = data ^ previous
+                previous = data
+                data = data.tobytes()
+            image.get_buffer().write(data)
+            yield frame, seconds, image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play or convert captured video")
+    parser.add_argument("path", help="raw or delta video written with --capture")
+    parser.add_argument("--png", metavar="DIR", help="save frames as PNG files")
+    args = parser.parse_args()
+
+    if args.png:
+        os.makedirs(args.png, exist_ok=True)
+        count = 0
+        for frame, _, image in read(args.path):
+            pygame.image.save(image, os.path.join(args.png, f"{frame:06}.png"))
+            count += 1
+        print(f"{count} frames saved to {args.png}")
+        return
+
+    pygame.init()
+    screen = None
+    count = 0
+    for _, seconds, image in read(args.path):
+        if screen is None:
+            screen = pygame.display.set_mode(image.get_size())
+            pygame.display.set_caption(f"Flappy Bird - {args.path}")
+            start = time.perf_counter() - seconds
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
+        delay = seconds - (time.perf_counter() - start)
+        if delay > 0:
+            time.sleep(delay)
+        screen.blit(image, (0, 0))
+        pygame.display.flip()
+        count += 1
+    print(f"{count} frames played")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from collections import deque
+
+import pygame
+
+from simulation import BIRD_HEIGHT, GROUND_Y, World, bird_hits_pipe
+
+
+class SweepList:
+    """
+    Sprites sorted by x which all move left with the same speed.
+    Sprites left behind the bird can never hit it again, so they are
+    dropped from the front and only the few sprites around the bird are
+    tested each frame.
+    """
+
+    def __init__(self):
+        self.sprites = deque()
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def add(self, sprite: pygame.sprite.Sprite):
+        """
+        Inserts sprite keeping order by x (usually it is the last one)
+        """
+        index = len(self.sprites)
+        while index and self.sprites[index - 1].rect.x > sprite.rect.x:
+            index -= 1
+        self.sprites.insert(index, sprite)
+
+    def remove(self, sprite: pygame.sprite.Sprite):
+        """
+        Removes sprite if it was not dropped yet (used by pooled sprites)
+        """
+        try:
+            self.sprites.remove(sprite)
+        except ValueError:
+            pass
+
+    def clear(self):
+        self.sprites.clear()
+
+    def candidates(self, rect: pygame.Rect):
+        """
+        Yields alive sprites which overlap rect by x
+        """
+        sprites = self.sprites
+        while sprites and (not sprites[0].alive() or sprites[0].rect.right < rect.left):
+            sprites.popleft()
+        for sprite in sprites:
+            if sprite.rect.left > rect.right:
+                break
+            if sprite.alive():
+                yield sprite
+
+
+class CollisionResult:
+    """
+    Everything the bird touched in one frame
+    """
+
+    def __init__(self, coins: list, fatal: bool):
+        self.coins = coins  # simulation.Coin models
+        self.fatal = fatal
+
+
+class CollisionSystem:
+    """
+    Broad phase by x position, then test of pipes near bird against
+    BIRD_SHAPE of simulation.World, coins are World.touched_coins().
+    Sprite masks are not used: they depend on frame of bird animation,
+    which is not recorded, so replays would crash or take coins elsewhere
+    """
+
+    def __init__(self):
+        self.pipes = SweepList()
+
+    def clear(self):
+        self.pipes.clear()
+
+    def check(self, bird: pygame.sprite.Sprite, world: World) -> CollisionResult:
+        """
+        Returns coins touched by bird and whether it crashed (the same tests
+        as World.check_collisions)
+        """
+        fatal = int(world.bird_y) + BIRD_HEIGHT > GROUND_Y
+        tested = None  # Both pipes of pair share model
+        for pipe in self.pipes.candidates(bird.rect):
+            if fatal:
+                break
+            if pipe.model is not tested:
+                tested = pipe.model
+                fatal = bird_hits_pipe(world.bird_y, tested)
+        return CollisionResult(world.touched_coins(), fatal)
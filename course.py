@@ -0,0 +1,211 @@
+import argparse
+import random
+from collections import deque
+
+# Classic course (the same for every pipe)
+SPEED = 2
+SKYLIGHT = 100  # Distance between two pipes
+PIPE_SPACING = 200
+GAP_Y_RANGE = (200, 350)
+COIN_CHANCE = 0.25
+
+
+class Difficulty:
+    """
+    Parameters of course at one pipe, returned by difficulty curves
+    """
+
+    __slots__ = (
+        "gap_y_range",
+        "max_step",
+        "skylight",
+        "spacing",
+        "speed",
+        "coin_chance",
+    )
+
+    def __init__(
+        self,
+        gap_y_range=GAP_Y_RANGE,
+        max_step=None,
+        skylight=SKYLIGHT,
+        spacing=PIPE_SPACING,
+        speed=SPEED,
+        coin_chance=COIN_CHANCE,
+    ):
+        self.gap_y_range = gap_y_range
+        # Largest change of gap_y from previous pipe (bird climbs slowly)
+        self.max_step = max_step
+        self.skylight = skylight
+        self.spacing = spacing  # Distance from previous pipe
+        self.speed = speed  # Pixels per tick while this pipe is ahead of bird
+        self.coin_chance = coin_chance
+
+
+def classic(index: int) -> Difficulty:
+    return Difficulty()
+
+
+def ramp(index: int) -> Difficulty:
+    """
+    Starts as classic and gets as hard as hard() over the first 100 pipes
+    """
+    progress = min(index, 100) / 100
+    return Difficulty(
+        max_step=round(150 - 70 * progress),
+        skylight=round(SKYLIGHT - 15 * progress),
+        spacing=round(PIPE_SPACING - 20 * progress),
+        speed=SPEED + progress // 0.5 * 0.25,
+    )
+
+
+def hard(index: int) -> Difficulty:
+    return Difficulty(max_step=80, skylight=85, spacing=180, speed=2.5)
+
+
+# Curves which can be named in course codes (index is stored in recordings)
+CURVES = {"classic": classic, "ramp": ramp, "hard": hard}
+
+
+class Segment:
+    """
+    One pipe of course: gap_y is top of lower pipe, gap is skylight pixels
+    high, spacing is distance from previous pipe
+    """
+
+    __slots__ = ("index", "gap_y", "skylight", "spacing", "speed", "coin")
+
+    def __init__(self, index, gap_y, skylight, spacing, speed, coin):
+        self.index = index
+        self.gap_y = gap_y
+        self.skylight = skylight
+        self.spacing = spacing
+        self.speed = speed
+        self.coin = coin  # Coin in the middle of gap
+
+    def __repr__(self):
+        return (
+            f"Segment(#{self.index}, gap {self.gap_y - self.skylight}-{self.gap_y}, "
+            f"spacing {self.spacing}, speed {self.speed}, coin {self.coin})"
+        )
+
+
+class Course:
+    """
+    Endless seeded stream of segments. Segments are generated on demand
+    into a lookahead window, so peeking at upcoming pipes does not create
+    them in the world. Same seed and curve give the same course
+    """
+
+    def __init__(self, seed=None, curve="classic"):
+        if callable(curve):
+            self.curve_name, self.curve = None, curve
+        else:
+            self.curve_name, self.curve = curve, CURVES[curve]
+        self.rng = random.Random(seed)
+        self.seed = None
+        self.window = deque()  # Generated segments which are not taken yet
+        self.index = 0  # Index of the next segment to take
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """
+        Starts course of seed, without seed the next seed is taken from
+        random generator of course (so every course can be shared)
+        """
+        if seed is None:
+            seed = self.rng.getrandbits(32)
+        self.seed = seed
+        self.rng.seed(seed)
+        self.window.clear()
+        self.index = 0
+        self.gap_y = None  # Gap of the last generated segment
+
+    @property
+    def code(self) -> str:
+        """
+        Short text to share course: curve name and seed
+        """
+        if self.curve_name is None:
+            raise ValueError("Only seeded courses of named curves have code")
+        return f"{self.curve_name}-{self.seed:x}"
+
+    @classmethod
+    def from_code(cls, code: str) -> "Course":
+        curve, _, seed = code.partition("-")
+        if curve not in CURVES or not seed:
+            raise ValueError(f"Bad course code '{code}'")
+        return cls(int(seed, 16), curve)
+
+    def generate(self) -> Segment:
+        index = self.index + len(self.window)
+        difficulty = self.curve(index)
+        low, high = difficulty.gap_y_range
+        if difficulty.max_step is not None and self.gap_y is not None:
+            low = max(low, self.gap_y - difficulty.max_step)
+            high = min(high, self.gap_y + difficulty.max_step)
+        self.gap_y = self.rng.randint(low, high)
+        # Random numbers are taken in the same order for every curve
+        segment = Segment(
+            index,
+            self.gap_y,
+            difficulty.skylight,
+            difficulty.spacing,
+            difficulty.speed,
+            self.rng.random() < difficulty.coin_chance,
+        )
+        self.window.append(segment)
+        return segment
+
+    def peek(self, ahead=0) -> Segment:
+        """
+        Returns segment ahead segments after the next one without taking it
+        """
+        while len(self.window) <= ahead:
+            self.generate()
+        return self.window[ahead]
+
+    def upcoming(self, count: int) -> list:
+        """
+        Returns next count segments without taking them
+        """
+        self.peek(count - 1)
+        return [self.window[i] for i in range(count)]
+
+    def take(self) -> Segment:
+        """
+        Returns next segment and moves past it
+        """
+        segment = self.peek()
+        self.window.popleft()
+        self.index += 1
+        return segment
+
+    def snapshot(self) -> tuple:
+        return (
+            self.seed,
+            self.index,
+            self.gap_y,
+            tuple(self.window),
+            self.rng.getstate(),
+        )
+
+    def restore(self, snapshot: tuple):
+        self.seed, self.index, self.gap_y, window, state = snapshot
+        self.window = deque(window)  # Segments are never changed
+        self.rng.setstate(state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print segments of course")
+    parser.add_argument("code", help="course code, for example classic-1f")
+    parser.add_argument("--count", type=int, default=20, help="number of pipes")
+    args = parser.parse_args()
+
+    course = Course.from_code(args.code)
+    for segment in course.upcoming(args.count):
+        print(segment)
+
+
+if __name__ == "__main__":
+    main()
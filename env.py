@@ -0,0 +1,151 @@
+import numpy as np
+import pygame
+
+from render import WorldPainter
+from simulation import BIRD_X, SCREEN_HEIGHT, SCREEN_WIDTH, World
+
+
+class FlappyEnv:
+    """
+    Gym-style environment: reset(seed) and step(action) over simulation.World.
+
+    obs_mode="state" gives float32 [bird y, velocity, distance to next pipe,
+    top of its gap]. obs_mode="pixels" gives (height, width, 3) uint8 frames.
+    Frames are drawn into a Surface which shares memory with a NumPy buffer,
+    so RGB and downsampled observations are views (valid until next step).
+    Grayscale frames are written into one preallocated array.
+    """
+
+    def __init__(
+        self,
+        obs_mode="state",
+        frame_skip=1,
+        grayscale=False,
+        downsample=1,
+        time_of_day="day",
+        color="yellow",
+        buffer=None,
+    ):
+        if obs_mode not in ("state", "pixels"):
+            raise ValueError(f"Unknown observation mode '{obs_mode}'")
+        self.obs_mode = obs_mode
+        self.frame_skip = frame_skip
+        self.grayscale = grayscale
+        self.downsample = downsample
+        self.world = World()
+
+        if obs_mode == "pixels":
+            if buffer is None:
+                buffer = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH, 4), dtype=np.uint8)
+            self.buffer = buffer
+            self.surface = pygame.image.frombuffer(
+                buffer, (SCREEN_WIDTH, SCREEN_HEIGHT), "RGBX"
+            )
+            self.painter = WorldPainter(time_of_day, color)
+            rgb = buffer[::downsample, ::downsample, :3]
+            self.pixels = rgb
+            self.gray = np.empty(rgb.shape[:2], dtype=np.float32)
+            self._channel = np.empty(rgb.shape[:2], dtype=np.float32)
+
+    def observe(self) -> np.ndarray:
+        if self.obs_mode == "state":
+            world = self.world
+            pipe = world.next_pipe()
+            if pipe is None:
+                return np.array([world.bird_y, world.velocity, 0, 0], dtype=np.float32)
+            return np.array(
+                [
+                    world.bird_y,
+                    world.velocity,
+                    pipe.x - BIRD_X,
+                    pipe.gap_y - pipe.skylight,
+                ],
+                dtype=np.float32,
+            )
+
+        self.painter.draw(self.surface, self.world)
+        if not self.grayscale:
+            return self.pixels
+        gray, channel = self.gray, self._channel
+        np.multiply(self.pixels[..., 0], 0.299, out=gray)
+        np.multiply(self.pixels[..., 1], 0.587, out=channel)
+        gray += channel
+        np.multiply(self.pixels[..., 2], 0.114, out=channel)
+        gray += channel
+        return gray
+
+    def reset(self, seed=None) -> np.ndarray:
+        self.world.reset(seed)
+        return self.observe()
+
+    def step(self, action) -> tuple:
+        """
+        Returns observation, reward, done and info.
+        Jump is made only in the first of frame_skip frames
+        """
+        reward = 0.0
+        for i in range(self.frame_skip):
+            result = self.world.step(bool(action) and i == 0)
+            reward += result.scored
+            if result.crashed:
+                reward -= 1.0
+                break
+        info = {
+            "score": self.world.score,
+            "coins": self.world.collected,
+            "frame": self.world.frame,
+        }
+        return self.observe(), reward, not self.world.alive, info
+
+
+class VecEnv:
+    """
+    Batch of FlappyEnv stepped together, finished envs are reset at once.
+    Pixel envs draw into slices of one array, so batch of frames is a view
+    """
+
+    def __init__(self, count, seed=None, **kwargs):
+        self.buffer = None
+        if kwargs.get("obs_mode") == "pixels":
+            self.buffer = np.zeros(
+                (count, SCREEN_HEIGHT, SCREEN_WIDTH, 4), dtype=np.uint8
+            )
+            self.envs = [
+                FlappyEnv(buffer=self.buffer[i], **kwargs) for i in range(count)
+            ]
+        else:
+            self.envs = [FlappyEnv(**kwargs) for _ in range(count)]
+        self.seed = seed
+        self.episodes = 0
+
+    def _next_seed(self):
+        if self.seed is None:
+            return None
+        self.episodes += 1
+        return self.seed + self.episodes - 1
+
+    def _batch(self, observations) -> np.ndarray:
+        env = self.envs[0]
+        if self.buffer is not None and not env.grayscale:
+            step = env.downsample
+            return self.buffer[:, ::step, ::step, :3]
+        return np.stack(observations)
+
+    def reset(self) -> np.ndarray:
+        return self._batch([env.reset(self._next_seed()) for env in self.envs])
+
+    def step(self, actions) -> tuple:
+        """
+        Returns batched observations, rewards, dones and list of infos
+        """
+        observations = []
+        rewards = np.empty(len(self.envs), dtype=np.float32)
+        dones = np.empty(len(self.envs), dtype=bool)
+        infos = []
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            obs, rewards[i], dones[i], info = env.step(action)
+            if dones[i]:
+                obs = env.reset(self._next_seed())
+            observations.append(obs)
+            infos.append(info)
+        return self._batch(observations), rewards, dones, infos
@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+
+class GameEvent:
+    """
+    Base of game events. Event types with coalesce = True are merged into
+    the pending event of the same type instead of being queued again
+    """
+
+    coalesce = False
+
+    def merge(self, other: "GameEvent"):
+        pass
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in vars(self).items())
+        return f"{type(self).__name__}({fields})"
+
+
+class Jumped(GameEvent):
+    coalesce = True
+
+
+class PipeSpawned(GameEvent):
+    def __init__(self, pipe):
+        self.pipe = pipe
+
+
+class Scored(GameEvent):
+    coalesce = True
+
+    def __init__(self, points: int):
+        self.points = points
+
+    def merge(self, other: "Scored"):
+        self.points += other.points
+
+
+class CoinTaken(GameEvent):
+    def __init__(self, coin):
+        self.coin = coin
+
+
+class Crashed(GameEvent):
+    coalesce = True
+
+    def __init__(self, score: int):
+        self.score = score
+
+
+class EventBus:
+    """
+    Synchronous dispatcher of game events (no pygame event queue).
+    Events emitted during a tick are delivered by dispatch() at its end
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(list)  # Event type -> callbacks
+        self.pending = []
+        self.coalesced = {}  # Event type -> its pending event
+        self.emitted = 0
+        self.merged = 0
+
+    def subscribe(self, event_type: type, callback):
+        self.subscribers[event_type].append(callback)
+
+    def unsubscribe(self, event_type: type, callback):
+        self.subscribers[event_type].remove(callback)
+
+    def emit(self, event: GameEvent):
+        self.emitted += 1
+        if event.coalesce:
+            pending = self.coalesced.get(type(event))
+            if pending is not None:
+                pending.merge(event)
+                self.merged += 1
+                return
+            self.coalesced[type(event)] = event
+        self.pending.append(event)
+
+    def dispatch(self):
+        """
+        Calls subscribers of pending events in order they were emitted.
+        Events emitted by subscribers are delivered in the same call
+        """
+        while self.pending:
+            pending, self.pending = self.pending, []
+            self.coalesced.clear()
+            for event in pending:
+                for callback in self.subscribers.get(type(event), ()):
+                    callback(event)
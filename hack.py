@@ -1,4 +1,3 @@
-from pickle import dump
+from storage import SaveData, SaveStore
 
-with open("data/data.fbd", "wb") as f:
-    dump((100, 500, "yellow", [True, False, False]), f)
+SaveStore().write(SaveData(100, 500, "yellow", [True, False, False]))
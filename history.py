@@ -0,0 +1,328 @@
+import argparse
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+HISTORY_PATH = "data/history.db"
+# Runs are written in one transaction per batch
+BATCH_SIZE = 256
+# Seconds writer waits for more runs before writing a batch
+BATCH_DELAY = 0.5
+
+# score_counts and color_stats are kept by trigger, so leaderboard places,
+# percentiles and per-skin statistics never scan runs
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    score INTEGER NOT NULL,
+    coins INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    color TEXT NOT NULL,
+    time_of_day TEXT NOT NULL,
+    seed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_score ON runs (score DESC);
+CREATE INDEX IF NOT EXISTS runs_finished ON runs (finished);
+CREATE TABLE IF NOT EXISTS score_counts (
+    score INTEGER PRIMARY KEY,
+    runs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS color_stats (
+    color TEXT PRIMARY KEY,
+    runs INTEGER NOT NULL,
+    total_score INTEGER NOT NULL,
+    best INTEGER NOT NULL,
+    coins INTEGER NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS runs_stats AFTER INSERT ON runs BEGIN
+    INSERT INTO score_counts VALUES (NEW.score, 1)
+        ON CONFLICT (score) DO UPDATE SET runs = runs + 1;
+    INSERT INTO color_stats
+        VALUES (NEW.color, 1, NEW.score, NEW.score, NEW.coins, NEW.duration)
+        ON CONFLICT (color) DO UPDATE SET
+            runs = runs + 1,
+            total_score = total_score + NEW.score,
+            best = max(best, NEW.score),
+            coins = coins + NEW.coins,
+            duration = duration + NEW.duration;
+END;
+"""
+COLUMNS = "finished, score, coins, duration, color, time_of_day, seed"
+
+
+class Run:
+    """
+    Finished game. place and total are set by writer after it is stored,
+    then stored is set (read them only after it)
+    """
+
+    def __init__(self, score, coins, duration, color, time_of_day, seed, finished=None):
+        self.finished = time.time() if finished is None else finished
+        self.score = score
+        self.coins = coins
+        self.duration = duration  # Seconds of game time
+        self.color = color
+        self.time_of_day = time_of_day
+        self.seed = seed
+        self.place = None  # Place among all runs (ties share the best place)
+        self.total = None  # Number of runs then
+        self.stored = threading.Event()
+
+    def __repr__(self):
+        return (
+            f"Run(score {self.score}, coins {self.coins}, {self.duration:.1f} s, "
+            f"{self.color}, {self.time_of_day}, seed {self.seed})"
+        )
+
+    def row(self) -> tuple:
+        return (
+            self.finished,
+            self.score,
+            self.coins,
+            self.duration,
+            self.color,
+            self.time_of_day,
+            self.seed,
+        )
+
+
+class RunHistory:
+    """
+    All finished runs in SQLite database. record() only queues run, the
+    writer thread inserts queued runs in batches
+    """
+
+    def __init__(self, path=HISTORY_PATH, batch_size=BATCH_SIZE, delay=BATCH_DELAY):
+        self.path = path
+        self.batch_size = batch_size
+        self.delay = delay
+        self.queue = queue.Queue()
+        self.thread = None
+        self.local = threading.local()  # Connection of each thread
+        self.last = None  # Last stored run
+        self.error = None
+        self.written = 0
+        self.batches = 0
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns connection of calling thread (created on first use)
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode = WAL")  # Readers do not block
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.executescript(SCHEMA)
+            self.local.connection = connection
+        return connection
+
+    def record(self, run: Run):
+        """
+        Queues run for writing (never touches disk)
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="history")
+            self.thread.daemon = True
+            self.thread.start()
+        self.queue.put(run)
+
+    def _run(self):
+        while True:
+            run = self.queue.get()
+            if run is None:
+                break
+            batch = [run]
+            deadline = time.perf_counter() + self.delay
+            while len(batch) < self.batch_size:
+                try:
+                    run = self.queue.get(
+                        timeout=max(0.0, deadline - time.perf_counter())
+                    )
+                except queue.Empty:
+                    break
+                if run is None:
+                    break
+                batch.append(run)
+            try:
+                self.write(batch)
+            except sqlite3.Error as error:  # Game goes on without history
+                self.error = error
+            if run is None:
+                break
+        self.close_connection()
+
+    def write(self, runs: list):
+        """
+        Inserts runs in one transaction and sets their places
+        """
+        connection = self.connection()
+        with connection:
+            connection.executemany(
+                f"INSERT INTO runs ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [run.row() for run in runs],
+            )
+        total = self.count()
+        for run in runs:
+            run.place = self.better(run.score) + 1
+            run.total = total
+            run.stored.set()  # Hands place and total to other threads
+        self.written += len(runs)
+        self.batches += 1
+        self.last = runs[-1]
+
+    def close_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def close(self):
+        """
+        Writes queued runs and stops writer thread
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        self.close_connection()
+
+    def count(self) -> int:
+        row = self.connection().execute("SELECT SUM(runs) FROM score_counts")
+        return row.fetchone()[0] or 0
+
+    def better(self, score: int) -> int:
+        """
+        Returns number of runs with higher score
+        """
+        row = self.connection().execute(
+            "SELECT SUM(runs) FROM score_counts WHERE score > ?", (score,)
+        )
+        return row.fetchone()[0] or 0
+
+    def percentile(self, score: int) -> float:
+        """
+        Returns percent of runs with lower score
+        """
+        total = self.count()
+        if not total:
+            return 0.0
+        row = self.connection().execute(
+            "SELECT SUM(runs) FROM score_counts WHERE score < ?", (score,)
+        )
+        return 100 * (row.fetchone()[0] or 0) / total
+
+    def score_at(self, percent: float) -> int:
+        """
+        Returns lowest score which percent of runs do not exceed
+        """
+        needed = percent / 100 * self.count()
+        seen = 0
+        score = 0
+        for score, runs in self.connection().execute(
+            "SELECT score, runs FROM score_counts ORDER BY score"
+        ):
+            seen += runs
+            if seen >= needed:
+                break
+        return score
+
+    def top(self, count=10) -> list:
+        """
+        Returns best runs (the earlier one of equal scores goes first)
+        """
+        rows = self.connection().execute(
+            f"SELECT {COLUMNS} FROM runs ORDER BY score DESC, id LIMIT ?", (count,)
+        )
+        return [self.from_row(row) for row in rows]
+
+    def recent(self, count=10) -> list:
+        rows = self.connection().execute(
+            f"SELECT {COLUMNS} FROM runs ORDER BY finished DESC LIMIT ?", (count,)
+        )
+        return [self.from_row(row) for row in rows]
+
+    def color_stats(self) -> dict:
+        """
+        Returns statistics of runs by bird color
+        """
+        stats = {}
+        for (
+            color,
+            runs,
+            total_score,
+            best,
+            coins,
+            duration,
+        ) in self.connection().execute("SELECT * FROM color_stats ORDER BY color"):
+            stats[color] = {
+                "runs": runs,
+                "best": best,
+                "average": total_score / runs,
+                "coins": coins,
+                "hours": duration / 3600,
+            }
+        return stats
+
+    @staticmethod
+    def from_row(row) -> Run:
+        finished, score, coins, duration, color, time_of_day, seed = row
+        return Run(score, coins, duration, color, time_of_day, seed, finished)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard of played games")
+    parser.add_argument("--path", default=HISTORY_PATH, help="database file")
+    parser.add_argument("--top", type=int, default=10, help="number of best runs")
+    parser.add_argument(
+        "--fill", type=int, metavar="N", help="add N random runs (for testing)"
+    )
+    args = parser.parse_args()
+
+    history = RunHistory(args.path)
+    if args.fill:
+        start = time.perf_counter()
+        for _ in range(args.fill):
+            history.record(
+                Run(
+                    int(random.expovariate(1 / 15)),
+                    random.randrange(10),
+                    random.uniform(2, 120),
+                    random.choice(("yellow", "blue", "red")),
+                    random.choice(("day", "night")),
+                    random.getrandbits(32),
+                )
+            )
+        history.close()
+        seconds = time.perf_counter() - start
+        print(
+            f"{args.fill} runs written in {seconds:.2f} s ({history.batches} batches)"
+        )
+
+    start = time.perf_counter()
+    total = history.count()
+    best = history.top(args.top)
+    percentiles = {p: history.score_at(p) for p in (50, 90, 99)}
+    stats = history.color_stats()
+    seconds = time.perf_counter() - start
+    print(f"{total} runs")
+    for place, run in enumerate(best, 1):
+        finished = time.strftime("%Y-%m-%d %H:%M", time.localtime(run.finished))
+        print(f"{place:3}. {run.score:5} {finished} {run}")
+    print(", ".join(f"{p}%: {score}" for p, score in percentiles.items()))
+    for color, stat in stats.items():
+        print(
+            f"{color}: {stat['runs']} runs, best {stat['best']}, "
+            f"average {stat['average']:.1f}, {stat['coins']} coins, "
+            f"{stat['hours']:.1f} h"
+        )
+    print(f"queries took {seconds * 1000:.1f} ms")
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
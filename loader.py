@@ -0,0 +1,65 @@
+import queue
+import threading
+import time
+
+
+class Loader:
+    """
+    Runs named groups of loading jobs one after another on a background
+    thread. States check ready(group) or wait(group) before using assets
+    """
+
+    def __init__(self):
+        self.groups = {}  # Name -> threading.Event set when group is loaded
+        self.times = {}  # Name -> time.perf_counter() when group was loaded
+        self.errors = {}
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def add(self, group: str, *jobs):
+        """
+        Queues callables of group (groups are loaded in order they are added)
+        """
+        self.groups[group] = threading.Event()
+        self.queue.put((group, jobs))
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="loader")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            group, jobs = self.queue.get()
+            try:
+                for job in jobs:
+                    job()
+            except BaseException as error:  # load_image exits on missing file
+                self.errors[group] = error
+            self.times[group] = time.perf_counter()
+            self.groups[group].set()
+
+    def ready(self, group=None) -> bool:
+        """
+        Checks if group (or every group) is loaded, unknown groups are ready
+        """
+        if group is None:
+            return all(event.is_set() for event in list(self.groups.values()))
+        event = self.groups.get(group)
+        return event is None or event.is_set()
+
+    def wait(self, group=None, timeout=None) -> bool:
+        """
+        Blocks until group (or every group) is loaded and raises its error.
+        Returns False on timeout
+        """
+        self.start()
+        names = list(self.groups) if group is None else [group]
+        for name in names:
+            event = self.groups.get(name)
+            if event is not None and not event.wait(timeout):
+                return False
+            if name in self.errors:
+                raise self.errors.pop(name)
+        return True
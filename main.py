@@ -1,296 +1,259 @@
+import argparse
 import os
 import random
 import sys
-from itertools import cycle
-import pickle
+import time
+from functools import cached_property
 
 import pygame
 
-
+from animation import CLOCK, get_animation
+from assets import ASSETS, load_image
+from atlas import load_atlas
+from audio import BUFFER, AudioManager, pre_init
+from capture import FORMATS, FrameCapture
+from autopilot import Autopilot
+from collision import CollisionSystem
+from course import CURVES, Course
+from events import CoinTaken, Crashed, EventBus, Jumped, PipeSpawned, Scored
+from loader import Loader
+from pool import Pool
+from history import HISTORY_PATH, Run, RunHistory
+from profiler import FrameProfiler, PerformanceHud
+from render import DirtyRenderer, ScrollingLayer
+from replay import Playback, Recorder, load
+from simulation import BIRD_START_Y, COIN_SIZE, GROUND_Y, SPEED, TICK, World
+from storage import SAVE_PATH, SaveData, SaveStore
+from text import NumberRenderer, TextCache, aligned
+
+
+# Start of startup time (--startup-time)
+STARTED = time.perf_counter()
+
+pre_init()
 pygame.init()
+ASSETS.use_atlas(load_atlas())
+
+# Longest frame which is simulated, slower frames make game run slower
+MAX_FRAME_TIME = 0.25
+# Ticks to show game over before returning to menu
+GAME_OVER_TICKS = 120
+# Events whose latency to present is measured
+INPUT_EVENTS = (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN)
+# Last part of wait for frame (--low-latency) which is spent reading input
+# instead of sleeping (sleep may oversleep by a millisecond or more)
+SPIN_TIME = 0.002
 
-# Bird physics
-GRAVITY = 0.1
 
-# Own events
-KILL_BIRD = pygame.USEREVENT + 1
-KILL_BIRD_EVENT = pygame.event.Event(KILL_BIRD)
+if "win" in sys.platform:
+    SOUND_PREFIX, SOUND_EXTENSION = "data/audio/wav/", ".wav"
+else:
+    SOUND_PREFIX, SOUND_EXTENSION = "data/audio/ogg/", ".ogg"
 
-ADD_SCORE = pygame.USEREVENT + 2
-ADD_SCORE_EVENT = pygame.event.Event(ADD_SCORE)
 
-ADD_COIN = pygame.USEREVENT + 3
-ADD_COIN_EVENT = pygame.event.Event(ADD_COIN)
+def load_sound(file_name: str) -> pygame.mixer.Sound:
+    sound = pygame.mixer.Sound(SOUND_PREFIX + file_name)
+    sound.set_volume(0.1)
+    return sound
 
 
-def load_audio() -> dict:
+class Sounds(dict):
     """
-    Returns a dict of pygame.mixer.Sound
+    Dict of pygame.mixer.Sound filled by loader thread,
+    sound which is not loaded yet is loaded on first use
     """
-    sounds = {}
-    sound_prefix = "data/audio/"
-    if "win" in sys.platform:
-        sound_prefix += "wav/"
-    else:
-        sound_prefix += "ogg/"
-    for file_name in os.listdir(sound_prefix):
-        sound = pygame.mixer.Sound(sound_prefix + file_name)
-        sound.set_volume(0.1)
-        sounds[file_name.split(".")[0]] = sound
-    return sounds
-
 
-SOUNDS = load_audio()
+    def __missing__(self, name):
+        sound = self[name] = load_sound(name + SOUND_EXTENSION)
+        return sound
 
 
-def load_image(fullname: str) -> pygame.Surface:
+def load_audio(sounds: dict) -> dict:
     """
-    Return a pygame.Surface (image) for sprites
+    Adds all sounds which are not loaded yet to sounds
     """
-    if not os.path.isfile(fullname):
-        print(f"Файл с изображением '{fullname}' не найден")
-        sys.exit()
-    image = pygame.image.load(fullname)
-    return image
+    for file_name in os.listdir(SOUND_PREFIX):
+        name = file_name.split(".")[0]
+        if name not in sounds:
+            sounds[name] = load_sound(file_name)
+    return sounds
 
 
-def load_animations(prefix: str) -> cycle:
-    """
-    Returns endless iterator of pygame.Surface for sprite's animation
-    """
-    animations = []
-    prefix = os.path.join("data/sprites", prefix)
-    for name in os.listdir(prefix):
-        path = os.path.join(prefix, name)
-        if os.path.isfile(path):
-            animations.append(load_image(path))
-    return cycle(animations)
+SOUNDS = Sounds()
+# Assets which are not needed for the first menu frame
+LOADER = Loader()
 
 
-class Background(pygame.sprite.Sprite):
+class Background(ScrollingLayer):
     """
     Endless moving background
     """
 
     def __init__(self):
-        super().__init__(all_sprites, backgrounds)
-        self.images = {
-            "day": load_image("data/sprites/back_ground/day.png"),
-            "night": load_image("data/sprites/back_ground/night.png"),
-        }
-        self.image = self.images["day"]
-        self.rect = self.image.get_rect()
-        self.mask = pygame.mask.from_surface(self.image)
-        self.speed = 2
-
-    def change_image(self, time_of_day: str):
-        """
-        Changes image of background
-        """
-        self.image = self.images[time_of_day]
-        self.mask = pygame.mask.from_surface(self.image)
-
-    def set_x(self, x_pos: float):
-        """
-        Changes x pos of background image (we use 2 pics)
-        """
-        self.rect.x = x_pos
-
-    def update(self):
-        if self.rect.x <= -self.rect.width:
-            self.rect.x = self.rect.width
-        self.rect.x -= self.speed
+        super().__init__(
+            {
+                "day": "data/sprites/back_ground/day.png",
+                "night": "data/sprites/back_ground/night.png",
+            },
+            0,
+            SPEED,
+        )
+        self.add(all_sprites, backgrounds)
 
 
 class Coin(pygame.sprite.Sprite):
-    def __init__(self, x_pos, y_pos):
-        super().__init__(all_sprites, coins)
-        self.anim = load_animations("coins")
-        self.image = next(self.anim)
-        self.mask = pygame.mask.from_surface(self.image)
+    """
+    Picture of simulation.Coin (taken from COINS pool)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.model = None
+        self.pool = None
+        self.animation = get_animation("coins", 4)
+        self.frame = 0
+        self.image = self.animation.frames[0]
+        self.mask = self.animation.masks[0]
         self.rect = self.image.get_rect()
-        self.rect.x = x_pos
-        self.rect.y = y_pos
-        self.transform()
+        self.start_tick = 0
 
-        self.speed = 2
+    def reset(self, model):
+        self.model = model
+        self.frame = 0
+        self.animation.apply(self, 0)
+        self.rect.centerx = int(model.x) + COIN_SIZE // 2
+        self.rect.y = int(model.y)
+        self.start_tick = CLOCK.frame
+        self.add(all_sprites, coins)
 
-        self.start_tick = pygame.time.get_ticks()
+    def release(self):
+        self.pool.release(self)
 
     def update(self):
-        seconds = (pygame.time.get_ticks() - self.start_tick) / 1000
-        if seconds > 0.1:
-            self.image = next(self.anim)
-            self.mask = pygame.mask.from_surface(self.image)
-            self.transform()
-            x, y = self.rect.centerx, self.rect.y
-            self.rect = self.image.get_rect()
-            self.rect.centerx, self.rect.y = x, y
-            self.start_tick = pygame.time.get_ticks()
-
-        if self.rect.x < -self.rect.width:
-            self.kill()
-        self.rect.x -= self.speed
-
-    def transform(self):
-        self.image = pygame.transform.scale(
-            self.image,
-            (self.image.get_rect().width // 4, self.image.get_rect().height // 4),
-        )
-        self.mask = pygame.mask.from_surface(self.image)
+        if self.model.removed:
+            self.release()
+            return
+        frame = self.animation.index(self.start_tick)
+        if frame != self.frame:
+            self.frame = frame
+            self.animation.apply(self, frame)
+        self.place(1)
+
+    def place(self, alpha: float, speed=SPEED):
+        """
+        Moves coin between previous and current tick positions
+        """
+        x_pos = self.model.x + speed * (1 - alpha)
+        self.rect.centerx = int(x_pos) + COIN_SIZE // 2
 
 
 class BasePipe(pygame.sprite.Sprite):
     """
-    Barriers which you should dodge
+    Barriers which you should dodge (picture of simulation.Pipe).
+    Pipes are taken from pools and reset for new model and time of day
     """
 
+    images = {
+        "day": "data/sprites/pipes/day.png",
+        "night": "data/sprites/pipes/night.png",
+    }
+    flip = (False, False)
+
     def __init__(self):
-        super().__init__(all_sprites, pipes)
-        self.images = {
-            "day": load_image("data/sprites/pipes/day.png"),
-            "night": load_image("data/sprites/pipes/night.png"),
-        }
-        self.image = self.images["day"]
-        self.mask = pygame.mask.from_surface(self.image)
+        super().__init__()
+        self.model = None
+        self.pool = None
+        self.time = None
+        self.change_image("day")
         self.rect = self.image.get_rect()
-        self.speed = 2
-        self.skylight = 100  # Distance between two pipes
-        self.used = False
 
     def change_image(self, time_of_day: str):
         """
         Changes image of pipe
         """
-        self.image = self.images[time_of_day]
-        self.mask = pygame.mask.from_surface(self.image)
+        if time_of_day == self.time:
+            return
+        self.time = time_of_day
+        self.image = ASSETS.image(self.images[time_of_day], self.flip)
+
+    def reset(self, model, time_of_day: str):
+        self.model = model
+        self.change_image(time_of_day)
+        self.rect.x = int(model.x)
+        self.add(all_sprites, pipes)
+        collisions.pipes.add(self)
+
+    def release(self):
+        collisions.pipes.remove(self)
+        self.pool.release(self)
 
-    def set_coin(self):
+    def update(self):
+        if self.model.removed:
+            self.release()
+            return
+        self.place(1)
+
+    def place(self, alpha: float, speed=SPEED):
         """
-        Spawn coin between pipes
+        Moves pipe between previous and current tick positions
         """
-        Coin(self.rect.x - 23, self.rect.y - self.skylight // 2 - 12)
-
-    def set_x(self, x_pos):
-        self.rect.x = x_pos
-
-    def update(self):
-        if not self.used and self.rect.x < 144:
-            pygame.event.post(ADD_SCORE_EVENT)
-            self.used = True
-        if self.rect.x < -self.rect.width:
-            self.kill()
-        self.rect.x -= self.speed
+        self.rect.x = int(self.model.x + speed * (1 - alpha))
 
 
 class DownPipe(BasePipe):
-    def __init__(self):
-        super().__init__()
-        self.set_y()
-
-    def set_y(self):
-        self.rect.y = random.randint(200, 350)
+    def reset(self, model, time_of_day: str):
+        super().reset(model, time_of_day)
+        self.rect.y = model.gap_y
 
 
 class UpPipe(BasePipe):
-    def __init__(self, down_x, down_y):
-        super().__init__()
-        self.images["day"] = pygame.transform.flip(self.images["day"], False, True)
-        self.images["night"] = pygame.transform.flip(self.images["night"], False, True)
-        self.image = self.images["day"]
-        self.mask = pygame.mask.from_surface(self.image)
-        self.rect.x = down_x
-        self.rect.y = down_y - self.skylight - self.rect.height
+    flip = (False, True)
 
-    def update(self):
-        if not self.used and self.rect.x < 144:
-            self.used = True
-        if self.rect.x < -self.rect.width:
-            self.kill()
-        self.rect.x -= self.speed
+    def reset(self, model, time_of_day: str):
+        super().reset(model, time_of_day)
+        self.rect.y = model.gap_y - model.skylight - self.rect.height
 
 
-class Ground(pygame.sprite.Sprite):
+class Ground(ScrollingLayer):
     """
-    Endless moving ground
+    Endless moving ground (bird crashes at its top, GROUND_Y)
     """
 
     def __init__(self):
-        super().__init__(all_sprites, grounds)
-        self.image = load_image("data/sprites/ground/ground.png")
-        self.mask = pygame.mask.from_surface(self.image)
-        self.rect = self.image.get_rect()
-        self.rect.y = 400
-        self.speed = 2
-
-    def set_x(self, x_pos: float):
-        """
-        Changes x pos of ground image (we use 2 pics)
-        """
-        self.rect.x = x_pos
-
-    def update(self):
-        if self.rect.x <= -self.rect.width:
-            self.rect.x = self.rect.width
-        self.rect.x -= self.speed
+        super().__init__({"day": "data/sprites/ground/ground.png"}, GROUND_Y, SPEED)
+        self.add(all_sprites, grounds)
 
 
 class Bird(pygame.sprite.Sprite):
     """
-    Main hero
+    Main hero (its height is taken from simulation.World)
     """
 
     def __init__(self, color):
         super().__init__(all_sprites)
         self.color = color
-        self.anim = load_animations("birds/" + self.color)
-        self.image = next(self.anim)
-        self.mask = pygame.mask.from_surface(self.image)
+        self.animation = get_animation("birds/" + self.color)
+        self.frame = 0
+        self.image = self.animation.frames[0]
+        self.mask = self.animation.masks[0]
         self.rect = self.image.get_rect()
         self.rect.x = 144 - self.rect.width // 2
-        self.rect.y = 256 - self.rect.height // 2
-        self.velocity = 0
+        self.rect.y = BIRD_START_Y
 
-        self.start_tick = pygame.time.get_ticks()
+        self.start_tick = CLOCK.frame
 
     def update(self):
-        for coin in coins:
-            if pygame.sprite.collide_mask(self, coin):
-                coin.kill()
-                pygame.event.post(ADD_COIN_EVENT)
-
-        ground_collided = pygame.sprite.spritecollide(self, grounds, False)
-        pygame.sprite.spritecollide(self, pipes, False)
-
-        if ground_collided:
-            pygame.event.post(KILL_BIRD_EVENT)
-
-        for pipe in pipes:
-            if pygame.sprite.collide_mask(self, pipe):
-                pygame.event.post(KILL_BIRD_EVENT)
-
-        self.velocity -= GRAVITY
-        seconds = (pygame.time.get_ticks() - self.start_tick) / 1000
-
-        if seconds > 0.1:
-            self.image = next(self.anim)
-            self.mask = pygame.mask.from_surface(self.image)
-            self.start_tick = pygame.time.get_ticks()
-
-        if self.rect.y <= 0:
-            self.velocity = -15 * GRAVITY
-
-        self.rect.y -= self.velocity
-
-    def jump(self):
-        SOUNDS["wing"].play()
-        self.velocity = 2
+        frame = self.animation.index(self.start_tick)
+        if frame != self.frame:
+            self.frame = frame
+            self.animation.apply(self, frame)
 
     def change_color(self, color):
         self.color = color
-        self.anim = load_animations("birds/" + self.color)
-        self.image = next(self.anim)
-        self.mask = pygame.mask.from_surface(self.image)
+        self.animation = get_animation("birds/" + self.color)
+        self.frame = 0
+        self.animation.apply(self, 0)
+        self.start_tick = CLOCK.frame
 
 
 class Text(pygame.sprite.Sprite):
@@ -300,7 +263,8 @@ class Text(pygame.sprite.Sprite):
 
     def __init__(self, x_finish, y_finish, name):
         super().__init__()
-        self.image = load_image(name)
+        self.name = name
+        self.image = ASSETS.image(name)
         self.rect = self.image.get_rect()
         self.x_finish = x_finish
         self.rect.y = y_finish
@@ -328,7 +292,8 @@ class Button(pygame.sprite.Sprite):
 
     def __init__(self, x_finish, y_finish, name):
         super().__init__()
-        self.image = load_image(name)
+        self.name = name
+        self.image = ASSETS.image(name)
         self.rect = self.image.get_rect()
         self.x_finish = x_finish
         self.rect.y = y_finish
@@ -344,8 +309,7 @@ class Button(pygame.sprite.Sprite):
 
     def transform(self, size):
         y_pos = self.rect.y
-        self.image = pygame.transform.scale(self.image, size)
-        self.image.set_colorkey((255, 255, 255))
+        self.image = ASSETS.image(self.name, scale=size, colorkey=(255, 255, 255))
         self.rect = self.image.get_rect()
         self.rect.x = -self.rect.width
         self.rect.y = y_pos
@@ -362,14 +326,17 @@ class Button(pygame.sprite.Sprite):
 
 
 class Score:
-    def __init__(self, score, y_pos):
+    """
+    Live score drawn with one cached number image
+    """
+
+    def __init__(self, score, y_pos, x_pos=0, align="left"):
         self.score = score
         self.y_pos = y_pos
-        self.images = {
-            file_name[0]: load_image("data/sprites/nums/" + file_name)
-            for file_name in os.listdir("data/sprites/nums")
-        }
-        self.digits = []
+        self.x_pos = x_pos
+        self.align = align  # Side of number at x_pos
+        self.image = None
+        self.pos = (x_pos, y_pos)
 
     def __add__(self, other):
         """
@@ -378,20 +345,12 @@ class Score:
         self.score += other
 
     def refresh(self):
-        self.digits.clear()
-        n = 0
-        for num in str(self.score):
-            digit = pygame.sprite.Sprite()
-            digit.image = self.images[num]
-            digit.rect = digit.image.get_rect()
-            digit.rect.x = digit.image.get_width() * n
-            digit.rect.y = self.y_pos
-            n += 1
-            self.digits.append(digit)
+        self.image = NUMBERS.render(self.score)
+        self.pos = aligned(self.image, (self.x_pos, self.y_pos), self.align)
 
     def show(self):
-        for digit in self.digits:
-            screen.blit(digit.image, digit.rect)
+        if self.image is not None:
+            screen.blit(self.image, self.pos)
 
 
 all_sprites = pygame.sprite.Group()
@@ -400,10 +359,29 @@ backgrounds = pygame.sprite.Group()
 grounds = pygame.sprite.Group()
 coins = pygame.sprite.Group()
 nums = pygame.sprite.Group()
+collisions = CollisionSystem()
+# Recycled sprites of pipes and coins
+DOWN_PIPES = Pool(DownPipe)
+UP_PIPES = Pool(UpPipe)
+COINS = Pool(Coin)
+
+
+def pool_stats() -> dict:
+    """
+    Returns occupancy of sprite pools
+    """
+    return {
+        "down_pipes": DOWN_PIPES.stats(),
+        "up_pipes": UP_PIPES.stats(),
+        "coins": COINS.stats(),
+    }
+
 
 # Font init for texts
 pygame.font.init()
 FONT = pygame.font.SysFont("Comic Sans MS", 15)
+TEXTS = TextCache(FONT)
+NUMBERS = NumberRenderer("nums")
 
 # Window attributes
 pygame.display.set_caption("Flappy Bird")
@@ -413,68 +391,202 @@ clock = pygame.time.Clock()
 
 screen = pygame.display.set_mode((288, 512))
 
-Background()
-b = Background()
-b.set_x(b.rect.width)
 
+def set_display(vsync=False):
+    """
+    Recreates window (vsync needs SCALED mode)
+    """
+    global screen
+    if vsync:
+        screen = pygame.display.set_mode((288, 512), pygame.SCALED, vsync=1)
+    else:
+        screen = pygame.display.set_mode((288, 512))
+
+
+Background()
 Ground()
-g = Ground()
-g.set_x(g.rect.width)
 bird = Bird("yellow")
 
 
 class GameHandler:
-    def __init__(self):
+    def __init__(
+        self,
+        dirty_rects=False,
+        fps=60,
+        profile_path=None,
+        hud=False,
+        startup_time=False,
+        record_path=None,
+        replay_path=None,
+        max_speed=False,
+        save_path=SAVE_PATH,
+        history_path=HISTORY_PATH,
+        curve="classic",
+        course=None,
+        autopilot=False,
+        attract=0.0,
+        audio_buffer=BUFFER,
+        audio_thread=False,
+        low_latency=False,
+        capture_path=None,
+        capture_format="raw",
+    ):
         self.game_mode = "MENU"
+        self.renderer = DirtyRenderer(screen, dirty_rects)
+        self.profiler = FrameProfiler()
+        self.profile_path = profile_path  # Dump of profiler on exit
+        self.hud = PerformanceHud(self.profiler, FONT)
+        self.hud.visible = hud
+        self.renderer.profiler = self.profiler
+        self.fps = fps  # Render rate, 0 means unlocked
+        self.lag = 0.0  # Time not simulated yet
+        self.events = []  # Input waiting for next tick
+        self.arrivals = []  # Times input of self.events was read
+        self.handled = []  # Times of input handled by ticks of current frame
+        self.input_time = 0.0  # When input of current tick was read
+        # Frames start right when the next tick is due and input is read
+        # while waiting for it
+        self.low_latency = low_latency
+        self.over_timer = 0
+        self.startup_time = startup_time  # Print time of first frame and loading
+        self.first_frame = None
+        # Games are written to recorder or played from playback instead of keys
+        self.recorder = Recorder(record_path) if record_path else None
+        self.playback = Playback(load(replay_path)) if replay_path else None
+        self.max_speed = max_speed  # One tick per frame whatever time passed
+        # Every game is played on this course (random one by default)
+        self.course = Course.from_code(course) if course else None
+        if self.course is not None:
+            curve = self.course.curve_name
+        # Pipes, coins and bird physics (collisions are checked by CollisionSystem)
+        self.world = World(collide=False, curve=curve)
+        # Game events of a tick, delivered at its end
+        self.bus = EventBus()
+        self.bus.subscribe(Jumped, self.on_jumped)
+        self.bus.subscribe(PipeSpawned, self.on_pipe_spawned)
+        self.bus.subscribe(Scored, self.on_scored)
+        self.bus.subscribe(CoinTaken, self.on_coin_taken)
+        self.bus.subscribe(Crashed, self.on_crashed)
+        # Autopilot plays every game (test-play) or demo games started after
+        # attract seconds in menu, they do not change progress
+        self.autopilot = Autopilot() if autopilot or attract else None
+        self.hud.autopilot = self.autopilot
+        # Sounds of a frame are played together after its ticks
+        self.audio = AudioManager(SOUNDS, audio_buffer, audio_thread)
+        self.hud.audio = self.audio
+        # Drawn frames are written to capture_path by background thread
+        self.capture = None
+        if capture_path:
+            self.capture = FrameCapture(capture_path, screen, capture_format)
+        self.hud.capture = self.capture
+        self.test_play = autopilot
+        self.attract_ticks = round(attract / TICK)
+        self.idle_ticks = 0  # Ticks in menu without input
+        self.demo = False  # Current game is played by autopilot
         self.prefix = "data/sprites/texts/"
-        # Load all spritess
-        self.over = Text(48, 235, self.prefix + "gameover.png")
+        # Sprites of the first menu frame, others are created on first use
         self.title = Text(55, 50, self.prefix + "title.png")
         self.get_ready = Text(52, 150, self.prefix + "get_ready.png")
         self.button_shop = Button(94, 450, self.prefix + "shop.png")
-        self.bird_yellow_button = Button(31, 130, "data/sprites/birds/yellow/1.png")
-        self.bird_blue_button = Button(127, 130, "data/sprites/birds/blue/1.png")
-        self.bird_red_button = Button(223, 130, "data/sprites/birds/red/1.png")
 
         self.button_shop.transform((100, 50))
 
         self.score = Score(0, 0)
 
-        # Load data from file
-        self.high_score, self.coins, color, self.shop_bought = self.load_data()
-        bird.change_color(color)
-
-        self.high_score_text = FONT.render(
+        # Load data from file, it is saved in background after every change
+        self.store = SaveStore(save_path)
+        data = self.store.load()
+        self.high_score, self.coins = data.high_score, data.coins
+        self.shop_bought = data.shop_bought
+        bird.change_color(data.color)
+        # Every finished game, written by background thread
+        self.history = RunHistory(history_path)
+        self.seed = None  # Course of current game
+        self.run = None  # Run of the last game, its place is known once written
+
+        self.high_score_text = TEXTS.render(
             f"High score: {self.high_score}", False, (255, 0, 0)
         )
-        self.coins_text = FONT.render(f"Coins: {self.coins}", False, (255, 0, 0))
-        self.bought_text = FONT.render("Bought", False, (255, 0, 0))
-        self.price_text = FONT.render("250 coins", False, (255, 0, 0))
+        self.coins_text = TEXTS.render(f"Coins: {self.coins}", False, (255, 0, 0))
+        self.bought_text = TEXTS.render("Bought", False, (255, 0, 0))
+        self.price_text = TEXTS.render("250 coins", False, (255, 0, 0))
 
         self.time = random.choice(["day", "night"])
 
         for background in backgrounds:
             background.change_image(self.time)
-        SOUNDS["swoosh"].play()
+        self.audio.trigger("swoosh")
+        self.load_later()
 
     @staticmethod
-    def load_data() -> tuple:
+    def load_later():
         """
-        Returns tuple of user data
+        Starts loading of sounds and sprites of game and shop in background
         """
-        with open("data/data.fbd", "rb") as f:
-            data = pickle.load(f)
-        return data
+        if LOADER.thread is not None:
+            return
+        LOADER.add("audio", lambda: load_audio(SOUNDS))
+        LOADER.add(
+            "game",
+            lambda: ASSETS.preload(
+                [
+                    "data/sprites/pipes/day.png",
+                    "data/sprites/pipes/night.png",
+                    "data/sprites/back_ground/day.png",
+                    "data/sprites/back_ground/night.png",
+                    "data/sprites/texts/gameover.png",
+                ]
+                + ASSETS.frames("coins")
+                + ASSETS.frames("nums")
+            ),
+        )
+        LOADER.add(
+            "shop",
+            lambda: ASSETS.preload(
+                ASSETS.frames("birds/yellow")
+                + ASSETS.frames("birds/blue")
+                + ASSETS.frames("birds/red")
+            ),
+        )
+        LOADER.start()
+
+    @cached_property
+    def over(self):
+        return Text(48, 235, self.prefix + "gameover.png")
+
+    @cached_property
+    def bird_yellow_button(self):
+        return Button(31, 130, "data/sprites/birds/yellow/1.png")
+
+    @cached_property
+    def bird_blue_button(self):
+        return Button(127, 130, "data/sprites/birds/blue/1.png")
+
+    @cached_property
+    def bird_red_button(self):
+        return Button(223, 130, "data/sprites/birds/red/1.png")
 
     def save_data(self):
         """
-        Saves data in file
+        Schedules saving of data (written by background thread)
         """
-        with open("data/data.fbd", "wb") as f:
-            pickle.dump((self.high_score, self.coins, bird.color, self.shop_bought), f)
+        if self.playback is None:  # Replayed games do not change saved data
+            self.store.save(
+                SaveData(self.high_score, self.coins, bird.color, self.shop_bought)
+            )
 
     def terminate(self):
         self.save_data()
+        self.store.close()
+        self.history.close()
+        self.audio.close()
+        if self.capture is not None:
+            self.capture.close()
+        if self.recorder is not None:
+            playing = self.game_mode == "GAME" and not self.demo
+            self.recorder.close(self.world if playing else None)
+        if self.profile_path:
+            self.profiler.dump(self.profile_path, audio=self.audio.stats())
         pygame.quit()
         sys.exit()
 
@@ -482,79 +594,182 @@ class GameHandler:
         """
         Shell of game
         """
+        previous = time.perf_counter()
+        while True:
+            if self.low_latency:
+                interval = 1 / self.fps if self.fps else 0.0
+                self.wait(previous + max(interval, TICK - self.lag))
+            now = time.perf_counter()
+            self.frame(TICK if self.max_speed else now - previous)
+            previous = now
+            if not self.low_latency:
+                clock.tick(self.fps)
+
+    def wait(self, deadline: float):
+        """
+        Sleeps until deadline, the last SPIN_TIME is spun reading input
+        """
         while True:
-            clock.tick(60)
-            if self.game_mode == "MENU":
-                self.game_mode = self.main_menu()
-            elif self.game_mode == "GAME":
-                self.game_mode = self.game()
-            elif self.game_mode == "OVER":
-                self.game_mode = self.game_over()
-            elif self.game_mode == "SHOP":
-                self.game_mode = self.shop()
-
-    def game_over(self):
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                return
+            if left > SPIN_TIME:
+                time.sleep(left - SPIN_TIME)
+            else:
+                self.poll()
+
+    def poll(self):
+        """
+        Moves pygame events to self.events and notes when input came
+        """
+        now = time.perf_counter()
         for event in pygame.event.get():
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.hud.toggle()
+            else:
+                self.events.append(event)
+                if event.type in INPUT_EVENTS:
+                    self.arrivals.append(now)
+
+    def frame(self, elapsed: float):
+        """
+        Simulates elapsed seconds in fixed ticks and draws one frame
+        between the last two ticks
+        """
+        self.profiler.begin_frame()
+        self.lag += min(elapsed, MAX_FRAME_TIME)
+        self.poll()
+        self.profiler.mark("events")
+
+        while self.lag >= TICK:
+            self.lag -= TICK
+            self.tick()
+        self.audio.flush()
+        self.profiler.mark("update")
+
+        self.renderer.extra = self.hud.update()
+        self.draw(self.lag / TICK)
+        self.profiler.mark("present")
+        presented = time.perf_counter()
+        if self.capture is not None:
+            self.capture.grab(screen)
+        latencies = [presented - arrival for arrival in self.handled]
+        self.handled.clear()
+        self.profiler.end_frame(len(all_sprites), len(pipes), len(coins), latencies)
+        if self.startup_time:
+            self.report_startup()
+
+    def report_startup(self):
+        """
+        Prints time from start to the first frame and to loaded assets
+        """
+        now = time.perf_counter()
+        if self.first_frame is None:
+            self.first_frame = now - STARTED
+            print(f"First frame: {self.first_frame * 1000:.0f} ms", flush=True)
+        if LOADER.ready():
+            for group, loaded in LOADER.times.items():
+                print(f"Loaded {group}: {(loaded - STARTED) * 1000:.0f} ms")
+            self.startup_time = False
+
+    def tick(self):
+        CLOCK.tick()
+        events, self.events = self.events, []
+        self.input_time = self.arrivals[0] if self.arrivals else time.perf_counter()
+        self.handled += self.arrivals
+        self.arrivals = []
+        game_mode = self.game_mode
+        if self.game_mode == "MENU":
+            self.game_mode = self.main_menu(events)
+        elif self.game_mode == "GAME":
+            self.game_mode = self.game(events)
+        elif self.game_mode == "OVER":
+            self.game_mode = self.game_over(events)
+        elif self.game_mode == "SHOP":
+            self.game_mode = self.shop(events)
+        self.bus.dispatch()
+        if self.game_mode != game_mode:
+            self.renderer.invalidate()
+
+    def draw(self, alpha: float):
+        if self.game_mode == "MENU":
+            self.draw_menu()
+        elif self.game_mode == "GAME":
+            self.draw_game(alpha)
+        elif self.game_mode == "OVER":
+            self.draw_game_over()
+        elif self.game_mode == "SHOP":
+            self.draw_shop()
+
+    def game_over(self, events):
+        for event in events:
             if event.type == pygame.QUIT:
                 self.terminate()
 
         if self.over.end:  # Check if image finish moving
+            self.over_timer += 1
+            if self.over_timer < GAME_OVER_TICKS:
+                return "OVER"
+            self.over_timer = 0
             self.over.renew()
-            pygame.time.wait(2000)
-            for pipe in pipes:
-                pipe.kill()
-            for coin in coins:
-                coin.kill()
-
-            # Renew sprites
-            bird.rect.y = 256 - bird.rect.height // 2
-            self.time = random.choice(["day", "night"])
-            self.high_score_text = FONT.render(
-                f"High score: {self.high_score}", False, (255, 0, 0)
-            )
-            self.coins_text = FONT.render(f"Coins: {self.coins}", False, (255, 0, 0))
-            for background in backgrounds:
-                background.change_image(self.time)
-            return "MENU"
+            return self.end_game()
 
         self.over.update()
-
-        all_sprites.draw(screen)
-        nums.draw(screen)
-        grounds.draw(screen)
-        screen.blit(self.over.image, self.over.rect)
-        screen.blit(self.high_score_text, (0, 475))
-
-        pygame.display.update()
-
         return "OVER"
 
-    def main_menu(self):
-        for event in pygame.event.get():
+    def end_game(self):
+        """
+        Removes sprites of game and returns to menu
+        """
+        self.scroll(SPEED)
+        for pipe in pipes.sprites():
+            pipe.release()
+        for coin in coins.sprites():
+            coin.release()
+        collisions.clear()
+
+        # Renew sprites
+        bird.rect.y = BIRD_START_Y
+        self.score.score = 0
+        self.demo = False
+        self.idle_ticks = 0
+        self.time = random.choice(["day", "night"])
+        self.high_score_text = TEXTS.render(
+            f"High score: {self.high_score}", False, (255, 0, 0)
+        )
+        self.coins_text = TEXTS.render(f"Coins: {self.coins}", False, (255, 0, 0))
+        for background in backgrounds:
+            background.change_image(self.time)
+        return "MENU"
+
+    def draw_game_over(self):
+        overlays = [(self.over.image, self.over.rect), (self.high_score_text, (0, 475))]
+        run = None if self.demo else self.run
+        if run is not None and run.stored.is_set():
+            place = TEXTS.render(
+                f"Place: {run.place} of {run.total}", False, (255, 0, 0)
+            )
+            overlays.append((place, (0, 453)))
+        if self.world.course.curve_name is not None:
+            code = TEXTS.render(f"Course: {self.world.course.code}", False, (255, 0, 0))
+            overlays.append((code, (0, 431)))
+        # Ground is drawn again over the pipes
+        self.renderer.render([all_sprites, grounds], overlays)
+
+    def main_menu(self, events):
+        if events:
+            self.idle_ticks = 0
+        for event in events:
             if event.type == pygame.QUIT:
                 self.terminate()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:  # Start game
-                    self.title.renew()
-                    self.get_ready.renew()
-                    self.button_shop.renew()
-                    bird.jump()
-                    self.score.refresh()
-                    for i in range(5):
-                        dp = DownPipe()
-                        dp.rect.x = 300 + dp.rect.x + 200 * i
-                        if random.choices([True, False], k=1, weights=[1, 3])[0]:
-                            dp.set_coin()
-                        up = UpPipe(dp.rect.x, dp.rect.y)
-                        dp.change_image(self.time)
-                        up.change_image(self.time)
-                    for background in backgrounds:
-                        background.change_image(self.time)
-                    return "GAME"
-            elif event.type == pygame.MOUSEBUTTONDOWN:
+            elif event.type == pygame.KEYDOWN and self.playback is None:
+                if event.key == pygame.K_SPACE:
+                    return self.start_game()
+            elif event.type == pygame.MOUSEBUTTONDOWN and self.playback is None:
                 if self.button_shop.check():  # Check shop button is clicked
+                    LOADER.wait("shop")
                     bird.rect.x = -100
-                    SOUNDS["swoosh"].play()
+                    self.audio.trigger("swoosh")
                     return "SHOP"
 
         if not self.title.end:
@@ -565,14 +780,59 @@ class GameHandler:
 
         if not self.get_ready.end:
             self.get_ready.update()
+        if self.playback is not None:
+            episode = self.playback.next()
+            if episode is None:
+                self.terminate()
+            self.time = episode.time_of_day
+            bird.change_color(episode.color)
+            return self.start_game(episode.seed, episode.curve)
+        self.idle_ticks += 1
+        if self.attract_ticks and self.idle_ticks >= self.attract_ticks:
+            self.demo = True
+            return self.start_game()
+        return "MENU"
 
-        all_sprites.draw(screen)
-        screen.blit(self.title.image, self.title.rect)
-        screen.blit(self.get_ready.image, self.get_ready.rect)
-        screen.blit(self.button_shop.image, self.button_shop.rect)
+    def start_game(self, seed=None, curve=None):
+        """
+        Starts new game on course of seed (random seed is recorded)
+        """
+        LOADER.wait("game")
+        if seed is None:
+            seed = random.getrandbits(32)
+            if self.course is not None:
+                seed = self.course.seed
+        if curve is not None and curve != self.world.course.curve_name:
+            self.world = World(collide=False, curve=curve)
+        self.title.renew()
+        self.get_ready.renew()
+        self.button_shop.renew()
+        self.seed = seed
+        self.world.reset(seed)
+        self.world.jump()
+        self.scroll(self.world.speed)
+        self.bus.emit(Jumped())
+        self.demo = self.demo or self.test_play and self.playback is None
+        if self.recorder is not None and not self.demo:
+            self.recorder.start(
+                seed, self.time, bird.color, self.world.course.curve_name
+            )
+        self.score.refresh()
+        for pipe in self.world.pipes:
+            self.add_pipe(pipe)
+        for background in backgrounds:
+            background.change_image(self.time)
+        return "GAME"
 
-        pygame.display.update()
-        return "MENU"
+    def draw_menu(self):
+        self.renderer.render(
+            [all_sprites],
+            [
+                (self.title.image, self.title.rect),
+                (self.get_ready.image, self.get_ready.rect),
+                (self.button_shop.image, self.button_shop.rect),
+            ],
+        )
 
     def choose_bird(self, color):
         bird.change_color(color)
@@ -580,15 +840,11 @@ class GameHandler:
         self.bird_yellow_button.renew()
         self.bird_red_button.renew()
         self.bird_blue_button.renew()
-        SOUNDS["swoosh"].play()
+        self.audio.trigger("swoosh")
+        self.save_data()
 
-    def shop(self):
-        txts = [
-            (self.bought_text, 25, 165),
-            (self.bought_text if self.shop_bought[1] else self.price_text, 110, 165),
-            (self.bought_text if self.shop_bought[2] else self.price_text, 215, 165),
-        ]
-        for event in pygame.event.get():
+    def shop(self, events):
+        for event in events:
             if event.type == pygame.QUIT:
                 self.terminate()
             elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -607,7 +863,8 @@ class GameHandler:
                             if self.coins >= 250:
                                 self.coins -= 250
                                 self.shop_bought[2] = True
-                                SOUNDS["bought"].play()
+                                self.audio.trigger("bought")
+                                self.save_data()
                     if self.bird_yellow_button.check():
                         if self.shop_bought[0]:
                             self.choose_bird("yellow")
@@ -620,7 +877,8 @@ class GameHandler:
                             if self.coins >= 250:
                                 self.coins -= 250
                                 self.shop_bought[1] = True
-                                SOUNDS["bought"].play()
+                                self.audio.trigger("bought")
+                                self.save_data()
 
         if not self.bird_yellow_button.end:
             self.bird_yellow_button.update()
@@ -630,61 +888,270 @@ class GameHandler:
 
         if not self.bird_red_button.end:
             self.bird_red_button.update()
-
-        all_sprites.draw(screen)
-        screen.blit(self.bird_yellow_button.image, self.bird_yellow_button.rect)
-        screen.blit(self.bird_blue_button.image, self.bird_blue_button.rect)
-        screen.blit(self.bird_red_button.image, self.bird_red_button.rect)
-        screen.blit(self.coins_text, (0, 475))
-
-        for t in txts:
-            screen.blit(t[0], (t[1], t[2]))
-
-        pygame.display.update()
         return "SHOP"
 
-    def game(self):
-        for event in pygame.event.get():
+    def draw_shop(self):
+        txts = [
+            (self.bought_text, 25, 165),
+            (self.bought_text if self.shop_bought[1] else self.price_text, 110, 165),
+            (self.bought_text if self.shop_bought[2] else self.price_text, 215, 165),
+        ]
+        self.renderer.render(
+            [all_sprites],
+            [
+                (self.bird_yellow_button.image, self.bird_yellow_button.rect),
+                (self.bird_blue_button.image, self.bird_blue_button.rect),
+                (self.bird_red_button.image, self.bird_red_button.rect),
+                (self.coins_text, (0, 475)),
+            ]
+            + [(t[0], (t[1], t[2])) for t in txts],
+        )
+
+    def game(self, events):
+        jump = False
+        for event in events:
             if event.type == pygame.QUIT:
                 self.terminate()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    bird.jump()
-            elif event.type == ADD_COIN:
-                self.coins += 1
-                SOUNDS["collect_coin"].play()
-            elif event.type == KILL_BIRD:
-                SOUNDS["hit"].play()
-                SOUNDS["die"].play()
-                bird.velocity = 0
-                if self.score.score > self.high_score:
-                    self.high_score = self.score.score
-                    self.high_score_text = FONT.render(
-                        f"High score: {self.high_score}", False, (255, 0, 0)
-                    )
-                self.score.score = 0
-                return "OVER"
-            elif event.type == ADD_SCORE:
-                SOUNDS["point"].play()
-                dp = DownPipe()
-                dp.rect.x = 150 + dp.rect.x + 200 * 5
-                up = UpPipe(dp.rect.x, dp.rect.y)
-                dp.change_image(self.time)
-                up.change_image(self.time)
-                if random.choices([True, False], k=1, weights=[1, 3])[0]:
-                    dp.set_coin()
-                self.score + 1
-                self.score.refresh()
+            elif self.demo and not self.test_play:
+                if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                    return self.end_game()  # Player came back to attract demo
+            elif event.type == pygame.KEYDOWN and self.playback is None:
+                if event.key == pygame.K_SPACE and not self.demo:
+                    jump = True
+
+        if self.demo:
+            jump = self.autopilot(self.world)
+        elif self.playback is not None:
+            episode = self.playback.episode
+            if not episode.crashed and self.world.frame >= episode.frames:
+                self.terminate()  # Recording ended in the middle of game
+            jump = self.playback.jump(self.world.frame)
+        if jump:
+            self.bus.emit(Jumped())
+            if self.recorder is not None and not self.demo:
+                self.recorder.jump(self.world.frame)
+
+        result = self.world.step(jump)
+        self.scroll(self.world.speed)
+        for pipe in result.spawned:
+            self.bus.emit(PipeSpawned(pipe))
+        if result.scored:
+            self.bus.emit(Scored(result.scored))
+
         all_sprites.update()
+        bird.rect.y = int(self.world.bird_y)
+
+        touched = collisions.check(bird, self.world)
+        for model in touched.coins:
+            self.world.take_coin(model)
+            self.bus.emit(CoinTaken(model))
+        if touched.coins:
+            for coin in coins.sprites():
+                if coin.model.removed:
+                    coin.release()
+
+        if touched.fatal:
+            self.world.crash()
+            self.bus.emit(Crashed(self.world.score))
+            return "OVER"
+        return "GAME"
+
+    def draw_game(self, alpha: float):
+        world = self.world
+        for group in (backgrounds, grounds):
+            for sprite in group:
+                sprite.place(alpha)
+        for group in (pipes, coins):
+            for sprite in group:
+                sprite.place(alpha, world.speed)
+        bird.rect.y = int(world.previous_y + (world.bird_y - world.previous_y) * alpha)
+
         all_sprites.draw(screen)
         grounds.draw(screen)
+        self.profiler.mark("draw")
         self.score.show()
-        pygame.display.update()
-        return "GAME"
+        self.profiler.mark("score")
+        self.renderer.present()
+
+    @staticmethod
+    def scroll(speed: float):
+        """
+        Sets speed of background and ground (each moves with its factor)
+        """
+        for layer in backgrounds.sprites() + grounds.sprites():
+            layer.speed = speed * layer.factor
+
+    def add_pipe(self, pipe):
+        """
+        Adds sprites for pipe of the world (and its coin)
+        """
+        DOWN_PIPES.acquire(pipe, self.time)
+        UP_PIPES.acquire(pipe, self.time)
+        if pipe.coin is not None:
+            COINS.acquire(pipe.coin)
+
+    def on_jumped(self, event: Jumped):
+        self.audio.trigger("wing", self.input_time)
+
+    def on_pipe_spawned(self, event: PipeSpawned):
+        self.add_pipe(event.pipe)
+
+    def on_scored(self, event: Scored):
+        self.audio.trigger("point")
+        self.score + event.points
+        self.score.refresh()
+
+    def on_coin_taken(self, event: CoinTaken):
+        if not self.demo:
+            self.coins += 1
+        self.audio.trigger("collect_coin")
+
+    def on_crashed(self, event: Crashed):
+        self.audio.trigger("hit")
+        self.audio.trigger("die")
+        self.score.score = 0
+        if self.demo:  # Games of autopilot are not saved
+            return
+        if event.score > self.high_score:
+            self.high_score = event.score
+            self.high_score_text = TEXTS.render(
+                f"High score: {self.high_score}", False, (255, 0, 0)
+            )
+        self.save_data()
+        if self.recorder is not None:
+            self.recorder.finish(self.world)
+        if self.playback is None:
+            self.run = Run(
+                event.score,
+                self.world.collected,
+                self.world.frame * TICK,
+                bird.color,
+                self.time,
+                self.seed,
+            )
+            self.history.record(self.run)
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    """
+    Returns command line options
+    """
+    parser = argparse.ArgumentParser(description="Flappy Bird")
+    parser.add_argument(
+        "--dirty-rects",
+        action="store_true",
+        help="update only changed screen regions in menu, shop and game over",
+    )
+    parser.add_argument(
+        "--fps",
+        type=int,
+        default=60,
+        help="render rate limit, 0 renders as fast as possible "
+        "(game speed does not depend on it)",
+    )
+    parser.add_argument("--vsync", action="store_true", help="wait for vertical sync")
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="save frame timings of last frames to .csv or .json file on exit",
+    )
+    parser.add_argument(
+        "--hud", action="store_true", help="show performance overlay (F3)"
+    )
+    parser.add_argument(
+        "--record", metavar="PATH", help="write played games to binary file"
+    )
+    parser.add_argument(
+        "--replay", metavar="PATH", help="play games recorded with --record"
+    )
+    parser.add_argument(
+        "--max-speed",
+        action="store_true",
+        help="simulate one tick per frame (with --fps 0 runs as fast as possible)",
+    )
+    parser.add_argument(
+        "--curve",
+        choices=sorted(CURVES),
+        default="classic",
+        help="difficulty of generated courses",
+    )
+    parser.add_argument(
+        "--course",
+        metavar="CODE",
+        help="play every game on this course (code is shown after game)",
+    )
+    parser.add_argument(
+        "--autopilot",
+        action="store_true",
+        help="autopilot plays games started from menu (they are not saved)",
+    )
+    parser.add_argument(
+        "--attract",
+        type=float,
+        default=0.0,
+        metavar="SECONDS",
+        help="autopilot plays demo game after SECONDS in menu without input",
+    )
+    parser.add_argument(
+        "--audio-buffer",
+        type=int,
+        default=BUFFER,
+        metavar="SAMPLES",
+        help="mixer buffer size, smaller plays sounds sooner",
+    )
+    parser.add_argument(
+        "--audio-thread",
+        action="store_true",
+        help="play sounds on background thread",
+    )
+    parser.add_argument(
+        "--low-latency",
+        action="store_true",
+        help="start frames when the next tick is due and read input "
+        "while waiting (uses more CPU)",
+    )
+    parser.add_argument(
+        "--capture",
+        metavar="PATH",
+        help="record drawn frames to video file (or folder of PNG files)",
+    )
+    parser.add_argument(
+        "--capture-format",
+        choices=FORMATS,
+        default="raw",
+        help="raw frames, PNG files or compressed changes between frames",
+    )
+    parser.add_argument(
+        "--startup-time",
+        action="store_true",
+        help="print time to the first frame and to loaded assets",
+    )
+    return parser.parse_args(args)
 
 
 def main():
-    game = GameHandler()
+    args = parse_args()
+    if args.vsync:
+        set_display(vsync=True)
+    game = GameHandler(
+        dirty_rects=args.dirty_rects,
+        fps=args.fps,
+        profile_path=args.profile,
+        hud=args.hud,
+        startup_time=args.startup_time,
+        record_path=args.record,
+        replay_path=args.replay,
+        max_speed=args.max_speed,
+        curve=args.curve,
+        course=args.course,
+        autopilot=args.autopilot,
+        attract=args.attract,
+        audio_buffer=args.audio_buffer,
+        audio_thread=args.audio_thread,
+        low_latency=args.low_latency,
+        capture_path=args.capture,
+        capture_format=args.capture_format,
+    )
     game.start()
 
 
@@ -0,0 +1,45 @@
+class Pool:
+    """
+    Free list of sprites of one type which are reused instead of created.
+    Sprites get reset(*args) when taken and must call release() instead
+    of kill()
+    """
+
+    def __init__(self, factory):
+        self.factory = factory  # Makes new sprite when free list is empty
+        self.free = []
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, *args):
+        """
+        Returns free (or new) sprite reset with args
+        """
+        if self.free:
+            sprite = self.free.pop()
+            self.reused += 1
+        else:
+            sprite = self.factory()
+            sprite.pool = self
+            self.created += 1
+        sprite.reset(*args)
+        return sprite
+
+    def release(self, sprite):
+        """
+        Removes sprite from its groups and puts it to free list
+        """
+        if sprite.alive():
+            sprite.kill()
+            self.free.append(sprite)
+
+    def stats(self) -> dict:
+        """
+        Returns occupancy of pool
+        """
+        return {
+            "active": self.created - len(self.free),
+            "free": len(self.free),
+            "created": self.created,
+            "reused": self.reused,
+        }
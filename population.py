@@ -0,0 +1,214 @@
+import argparse
+import sys
+
+import numpy as np
+
+from simulation import (
+    BIRD_HEIGHT,
+    BIRD_SHAPE,
+    BIRD_START_Y,
+    BIRD_WIDTH,
+    BIRD_X,
+    CEILING_VELOCITY,
+    COIN_SIZE,
+    GRAVITY,
+    GROUND_Y,
+    JUMP_VELOCITY,
+    PIPE_BODY_INSET,
+    PIPE_CAP_HEIGHT,
+    PIPE_HEIGHT,
+    PIPE_WIDTH,
+    World,
+)
+
+# Screen columns [left, right) of every row of bird shape
+SHAPE_LEFT = np.array([left for left, _ in BIRD_SHAPE]) + BIRD_X
+SHAPE_RIGHT = np.array([right for _, right in BIRD_SHAPE]) + BIRD_X
+
+
+def hits_rect(top, left, rect_top, right, rect_bottom) -> np.ndarray:
+    """
+    simulation.bird_hits_rect for array of bird tops (ints)
+    """
+    # Rows overlapping rectangle by x, counted from the first row
+    rows = np.zeros(BIRD_HEIGHT + 1, dtype=np.int64)
+    np.cumsum((SHAPE_LEFT < right) & (SHAPE_RIGHT > left), out=rows[1:])
+    first = np.clip(rect_top - top, 0, BIRD_HEIGHT)
+    last = np.clip(rect_bottom - top, 0, BIRD_HEIGHT)
+    return rows[last] > rows[first]
+
+
+def hits_pipe(top, pipe) -> np.ndarray:
+    """
+    simulation.bird_hits_pipe for array of bird tops
+    """
+    left = int(pipe.x)
+    right = left + PIPE_WIDTH
+    body_left = left + PIPE_BODY_INSET
+    body_right = right - PIPE_BODY_INSET
+    gap_top = pipe.gap_y - pipe.skylight
+    gap_bottom = pipe.gap_y
+    hit = hits_rect(top, left, gap_top - PIPE_CAP_HEIGHT, right, gap_top)
+    hit |= hits_rect(top, left, gap_bottom, right, gap_bottom + PIPE_CAP_HEIGHT)
+    hit |= hits_rect(
+        top, body_left, gap_top - PIPE_HEIGHT, body_right, gap_top - PIPE_CAP_HEIGHT
+    )
+    hit |= hits_rect(
+        top,
+        body_left,
+        gap_bottom + PIPE_CAP_HEIGHT,
+        body_right,
+        gap_bottom + PIPE_HEIGHT,
+    )
+    return hit
+
+
+class Population:
+    """
+    Many birds flying through one course at once.
+    Birds are rows of NumPy arrays and pipes and coins are tested against
+    bird shape as in World, so a step costs the same few vector operations
+    for any number of birds.
+    """
+
+    def __init__(self, size: int, seed=None):
+        self.size = size
+        self.course = World(seed, collide=False)  # Only moves pipes and coins
+        self.y = np.empty(size)
+        self.velocity = np.empty(size)
+        self.alive = np.empty(size, dtype=bool)
+        self.scores = np.empty(size, dtype=np.int64)
+        self.coins = np.empty(size, dtype=np.int64)
+        self.frames = np.empty(size, dtype=np.int64)
+        self.taken = {}  # Coin -> birds which have already taken it
+        self._top = np.empty(size, dtype=np.int64)
+        self._hit = np.empty(size, dtype=bool)
+        self.reset(self.course.course.seed)
+
+    def reset(self, seed=None):
+        self.course.reset(seed)
+        self.y.fill(BIRD_START_Y)
+        self.velocity.fill(0)
+        self.alive.fill(True)
+        self.scores.fill(0)
+        self.coins.fill(0)
+        self.frames.fill(0)
+        self.taken.clear()
+
+    def observe(self) -> np.ndarray:
+        """
+        Returns (size, 4) array: bird y, velocity, distance to next pipe
+        and top of its gap
+        """
+        pipe = self.course.next_pipe()
+        obs = np.empty((self.size, 4))
+        obs[:, 0] = self.y
+        obs[:, 1] = self.velocity
+        if pipe is None:
+            obs[:, 2] = 0
+            obs[:, 3] = BIRD_START_Y
+        else:
+            obs[:, 2] = pipe.x - BIRD_X
+            obs[:, 3] = pipe.gap_y - pipe.skylight
+        return obs
+
+    def step(self, actions) -> np.ndarray:
+        """
+        Moves all birds one frame, actions is bool array of jumps.
+        Returns alive mask
+        """
+        alive = self.alive
+        velocity = self.velocity
+        jumps = np.asarray(actions, dtype=bool) & alive
+        np.copyto(velocity, JUMP_VELOCITY, where=jumps)
+        np.subtract(velocity, GRAVITY, out=velocity, where=alive)
+        np.copyto(velocity, CEILING_VELOCITY, where=(self.y <= 0) & alive)
+        np.subtract(self.y, velocity, out=self.y, where=alive)
+        self.frames += alive
+
+        result = self.course.step()
+        if result.scored:
+            self.scores += alive * result.scored
+
+        top = self._top
+        hit = self._hit
+        np.copyto(top, self.y, casting="unsafe")  # int() like sprite rect
+        np.greater(top + BIRD_HEIGHT, GROUND_Y, out=hit)
+        for pipe in self.course.pipes:
+            if pipe.x >= BIRD_X + BIRD_WIDTH:
+                break
+            if pipe.x + PIPE_WIDTH <= BIRD_X:
+                continue
+            hit |= hits_pipe(top, pipe)
+        for coin in self.course.coins:
+            if coin.x >= BIRD_X + BIRD_WIDTH:
+                break
+            if coin.x + COIN_SIZE <= BIRD_X:
+                continue
+            taken = self.taken.get(coin)
+            if taken is None:
+                taken = self.taken[coin] = np.zeros(self.size, dtype=bool)
+            left, coin_top = int(coin.x), int(coin.y)
+            got = alive & ~taken
+            got &= hits_rect(
+                top, left, coin_top, left + COIN_SIZE, coin_top + COIN_SIZE
+            )
+            taken |= got
+            self.coins += got
+        for coin in [coin for coin in self.taken if coin.removed]:
+            del self.taken[coin]
+
+        alive &= ~hit
+        return alive
+
+    def run(self, policy, max_frames=100000) -> np.ndarray:
+        """
+        Flies until all birds die, policy maps observe() to jumps.
+        Returns scores
+        """
+        while self.alive.any() and self.course.frame < max_frames:
+            self.step(policy(self.observe()))
+        return self.scores
+
+
+def check(seed, policy, max_frames=100000) -> int:
+    """
+    Flies one-bird Population next to World(seed) with the same jumps.
+    Returns frame where they differ (-1 if they never do)
+    """
+    world = World(seed)
+    population = Population(1, seed)
+    while world.alive and world.frame < max_frames:
+        jump = policy(world)
+        world.step(jump)
+        population.step([jump])
+        if (
+            population.y[0] != world.bird_y
+            or population.alive[0] != world.alive
+            or population.scores[0] != world.score
+            or population.coins[0] != world.collected
+        ):
+            return world.frame
+    return -1
+
+
+def main():
+    from runner import ThresholdPolicy
+
+    parser = argparse.ArgumentParser(description="Check population against World")
+    parser.add_argument("--seeds", type=int, default=20, help="courses to fly")
+    parser.add_argument("--max-frames", type=int, default=20000)
+    args = parser.parse_args()
+
+    failed = 0
+    for seed in range(args.seeds):
+        frame = check(seed, ThresholdPolicy(), args.max_frames)
+        if frame >= 0:
+            print(f"seed {seed}: differs from World at frame {frame}")
+            failed += 1
+    print(f"{args.seeds - failed} of {args.seeds} courses match World")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
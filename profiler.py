@@ -0,0 +1,233 @@
+import csv
+import json
+import time
+from array import array
+
+# Parts of one frame in order they happen
+PHASES = ("events", "update", "draw", "score", "present")
+COUNTS = ("sprites", "pipes", "coins")
+
+
+class LatencyHistogram:
+    """
+    Counts of latencies in bins of width seconds, the last bin also
+    takes all longer ones
+    """
+
+    def __init__(self, width=0.001, bins=100):
+        self.width = width
+        self.counts = array("l", [0]) * bins
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.counts[min(int(seconds / self.width), len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns upper edge of bin with q-th part (0..1) of latencies
+        """
+        needed = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= needed:
+                return (index + 1) * self.width
+        return 0.0
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            # Start of bin in ms -> latencies in it
+            "bins_ms": {
+                round(index * self.width * 1000, 3): count
+                for index, count in enumerate(self.counts)
+                if count
+            },
+        }
+
+
+class FrameProfiler:
+    """
+    Times of frame phases and sprite counts of last size frames.
+    Data lives in preallocated arrays used as a ring buffer
+    """
+
+    def __init__(self, size=600):
+        self.size = size
+        self.phases = {phase: array("d", [0.0]) * size for phase in PHASES}
+        self.totals = array("d", [0.0]) * size
+        self.counts = {name: array("l", [0]) * size for name in COUNTS}
+        # Longest time from input to present of frame which showed it
+        self.input_latency = array("d", [0.0]) * size
+        self.input_histogram = LatencyHistogram()
+        self.index = 0  # Slot of current frame
+        self.frames = 0  # Frames recorded since start
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def begin_frame(self):
+        self.frame_start = self.last_mark = time.perf_counter()
+        for phase in PHASES:
+            self.phases[phase][self.index] = 0.0
+
+    def mark(self, phase: str):
+        """
+        Adds time since previous mark to phase of current frame
+        """
+        now = time.perf_counter()
+        self.phases[phase][self.index] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self, sprites=0, pipes=0, coins=0, latencies=()):
+        """
+        latencies are times from input to present of inputs handled
+        by this frame
+        """
+        index = self.index
+        self.totals[index] = time.perf_counter() - self.frame_start
+        for latency in latencies:
+            self.input_histogram.add(latency)
+        self.input_latency[index] = max(latencies, default=0.0)
+        self.counts["sprites"][index] = sprites
+        self.counts["pipes"][index] = pipes
+        self.counts["coins"][index] = coins
+        self.index = (index + 1) % self.size
+        self.frames += 1
+
+    def recorded(self) -> list:
+        """
+        Returns slots of recorded frames from oldest to newest
+        """
+        if self.frames < self.size:
+            return list(range(self.frames))
+        return [(self.index + i) % self.size for i in range(self.size)]
+
+    def percentile(self, q: float, phase=None) -> float:
+        """
+        Returns q-th part (0..1) of frame (or phase) time in seconds
+        """
+        values = self.totals if phase is None else self.phases[phase]
+        times = sorted(values[i] for i in self.recorded())
+        if not times:
+            return 0.0
+        return times[min(len(times) - 1, int(q * len(times)))]
+
+    def summary(self) -> dict:
+        return {
+            "frames": self.frames,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "phases_p50": {phase: self.percentile(0.5, phase) for phase in PHASES},
+            "phases_p99": {phase: self.percentile(0.99, phase) for phase in PHASES},
+            "input_latency": self.input_histogram.summary(),
+        }
+
+    def rows(self) -> list:
+        """
+        Returns recorded frames as dicts (times in seconds)
+        """
+        rows = []
+        first = self.frames - len(self.recorded())
+        for n, i in enumerate(self.recorded()):
+            row = {"frame": first + n, "total": self.totals[i]}
+            for phase in PHASES:
+                row[phase] = self.phases[phase][i]
+            for name in COUNTS:
+                row[name] = self.counts[name][i]
+            row["input_latency"] = self.input_latency[i]
+            rows.append(row)
+        return rows
+
+    def dump(self, path: str, **extra):
+        """
+        Saves recorded frames to .csv or .json file (extra statistics are
+        added to summary of .json)
+        """
+        rows = self.rows()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(
+                    f, ["frame", "total", *PHASES, *COUNTS, "input_latency"]
+                )
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, "w") as f:
+                summary = {**self.summary(), **extra}
+                json.dump({"summary": summary, "frames": rows}, f, indent=1)
+
+
+class PerformanceHud:
+    """
+    Overlay with frame time percentiles and sprite counts
+    """
+
+    def __init__(self, profiler: FrameProfiler, font, refresh=0.5):
+        self.profiler = profiler
+        self.font = font
+        self.refresh = refresh  # Seconds between text updates
+        self.visible = False
+        self.autopilot = None  # Its planning time is shown when set
+        self.audio = None  # Sound latency is shown when set
+        self.capture = None  # Dropped frames of capture are shown when set
+        self.overlays = []
+        self.updated = 0.0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.updated = 0.0
+
+    def update(self) -> list:
+        """
+        Returns (image, pos) pairs to draw
+        """
+        if not self.visible:
+            return []
+        now = time.perf_counter()
+        if now - self.updated < self.refresh:
+            return self.overlays
+        self.updated = now
+        profiler = self.profiler
+        index = (profiler.index - 1) % profiler.size
+        lines = [
+            f"p50 {profiler.percentile(0.5) * 1000:.2f} ms  "
+            f"p99 {profiler.percentile(0.99) * 1000:.2f} ms",
+            "sprites {} pipes {} coins {}".format(
+                *(profiler.counts[name][index] for name in COUNTS)
+            ),
+        ]
+        histogram = profiler.input_histogram
+        if histogram.count:
+            lines.append(
+                f"input p50 {histogram.percentile(0.5) * 1000:.0f} ms  "
+                f"p99 {histogram.percentile(0.99) * 1000:.0f} ms"
+            )
+        if self.autopilot is not None:
+            stats = self.autopilot.stats()
+            lines.append(
+                f"autopilot {stats['mean_ms']:.2f} ms  p99 {stats['p99_ms']:.2f} ms"
+            )
+        if self.audio is not None:
+            lines.append(
+                f"sound p50 {self.audio.latency(0.5) * 1000:.1f} ms  "
+                f"p99 {self.audio.latency(0.99) * 1000:.1f} ms"
+            )
+        if self.capture is not None:
+            stats = self.capture.stats()
+            lines.append(f"capture {stats['written']} dropped {stats['dropped']}")
+        self.overlays = [
+            (
+                self.font.render(line, False, (255, 255, 255), (0, 0, 0)),
+                (0, 40 + 20 * n),
+            )
+            for n, line in enumerate(lines)
+        ]
+        return self.overlays
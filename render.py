@@ -0,0 +1,243 @@
+import pygame
+
+from animation import FRAME_TICKS, get_animation
+from assets import ASSETS
+from simulation import (
+    BIRD_X,
+    COIN_SIZE,
+    GROUND_Y,
+    PIPE_HEIGHT,
+    SCREEN_WIDTH,
+    SPEED,
+    World,
+)
+
+
+class DirtyRenderer:
+    """
+    Presents only changed regions of screens where sprites stand still
+    and only texts or buttons move.
+    Scrolling frames fall back to full updates.
+    """
+
+    def __init__(self, screen: pygame.Surface, enabled: bool = False):
+        self.screen = screen
+        self.enabled = enabled
+        self.scene = None  # Static sprites drawn once
+        self.scene_key = None
+        self.drawn = []  # Overlays drawn in the last frame
+        self.extra = []  # Overlays added to every frame (performance HUD)
+        self.profiler = None
+
+    @staticmethod
+    def snapshot(layers) -> tuple:
+        """
+        Returns key describing images and positions of all sprites
+        """
+        return tuple(
+            (id(sprite.image), tuple(sprite.rect))
+            for layer in layers
+            for sprite in layer
+        )
+
+    def invalidate(self):
+        """
+        Forces full redraw in the next frame
+        """
+        self.scene_key = None
+
+    def present(self):
+        """
+        Pushes whole screen (used by scrolling frames)
+        """
+        self.invalidate()
+        for image, pos in self.extra:
+            self.screen.blit(image, pos)
+        if self.profiler is not None:
+            self.profiler.mark("draw")
+        pygame.display.update()
+
+    def render(self, layers, overlays):
+        """
+        Draws groups from layers and (image, pos) pairs from overlays
+        """
+        drawn = [
+            (image, image.get_rect(topleft=tuple(pos)[:2]))
+            for image, pos in list(overlays) + self.extra
+        ]
+        if not self.enabled:
+            for layer in layers:
+                layer.draw(self.screen)
+            for image, rect in drawn:
+                self.screen.blit(image, rect)
+            self.invalidate()
+            if self.profiler is not None:
+                self.profiler.mark("draw")
+            pygame.display.update()
+            return
+
+        key = self.snapshot(layers)
+        if key != self.scene_key:
+            if self.scene is None:
+                self.scene = self.screen.copy()
+            for layer in layers:
+                layer.draw(self.scene)
+            self.scene_key = key
+            self.screen.blit(self.scene, (0, 0))
+            for image, rect in drawn:
+                self.screen.blit(image, rect)
+            self.drawn = drawn
+            if self.profiler is not None:
+                self.profiler.mark("draw")
+            pygame.display.update()
+            return
+
+        dirty = []
+        if len(drawn) != len(self.drawn):
+            dirty.extend(rect for _, rect in self.drawn)
+            dirty.extend(rect for _, rect in drawn)
+        else:
+            for (old_image, old_rect), (image, rect) in zip(self.drawn, drawn):
+                if old_image is not image or old_rect != rect:
+                    dirty.append(old_rect)
+                    dirty.append(rect)
+        self.drawn = drawn
+        if not dirty:
+            if self.profiler is not None:
+                self.profiler.mark("draw")
+            return
+
+        for rect in dirty:
+            self.screen.blit(self.scene, rect, rect)
+        for image, rect in drawn:
+            if rect.collidelist(dirty) != -1:
+                self.screen.blit(image, rect)
+        if self.profiler is not None:
+            self.profiler.mark("draw")
+        pygame.display.update(dirty)
+
+
+class ScrollingLayer(pygame.sprite.Sprite):
+    """
+    Endless image scrolling to the left (one parallax layer).
+    Image of every theme is tiled once into a wide strip and the visible
+    part is a cached subsurface of it, so layer is drawn with one blit.
+    Layer moves with factor of world speed (far layers move slower)
+    """
+
+    strips = {}  # (path, width) -> strip shared by all layers
+
+    def __init__(
+        self, images: dict, y_pos: int, speed: float, width=SCREEN_WIDTH, factor=1.0
+    ):
+        super().__init__()
+        self.images = images  # Theme -> path of image
+        self.factor = factor
+        self.speed = speed * factor
+        self.width = width  # Width of visible part
+        self.offset = 0.0  # Scrolled distance within one tile
+        self.theme = None
+        self.windows = {}  # (theme, x) -> subsurface
+        self.change_image(next(iter(images)))
+        self.rect = self.image.get_rect(topleft=(0, y_pos))
+
+    def strip(self, path: str) -> pygame.Surface:
+        """
+        Returns image repeated enough times to cut any visible part from it
+        """
+        strip = self.strips.get((path, self.width))
+        if strip is None:
+            image = ASSETS.image(path)
+            tile = image.get_width()
+            tiles = -(-self.width // tile) + 1
+            # Format of converted image, 32-bit for palette images without window
+            strip = pygame.Surface(
+                (tile * tiles, image.get_height()),
+                image.get_flags() & pygame.SRCALPHA,
+                image if image.get_bitsize() == 32 else 32,
+            )
+            for n in range(tiles):
+                # Adding to empty surface copies alpha too instead of blending
+                strip.blit(image, (tile * n, 0), special_flags=pygame.BLEND_RGBA_ADD)
+            self.strips[(path, self.width)] = strip
+        return strip
+
+    def change_image(self, theme: str):
+        """
+        Changes theme of layer (day or night)
+        """
+        self.theme = theme
+        image = ASSETS.image(self.images[theme])
+        self.tile = image.get_width()
+        self.strip(self.images[theme])
+        self.show(self.offset)
+
+    def show(self, offset: float):
+        """
+        Sets image to visible part of strip at offset
+        """
+        key = (self.theme, int(offset) % self.tile)
+        window = self.windows.get(key)
+        if window is None:
+            strip = self.strips[(self.images[self.theme], self.width)]
+            window = strip.subsurface((key[1], 0, self.width, strip.get_height()))
+            self.windows[key] = window
+        self.image = window
+
+    def scroll_to(self, distance: float):
+        """
+        Shows layer scrolled by distance from start
+        """
+        self.offset = distance % self.tile
+        self.show(self.offset)
+
+    def update(self):
+        self.scroll_to(self.offset + self.speed)
+
+    def place(self, alpha: float):
+        """
+        Shows layer between previous and current tick positions
+        """
+        self.show((self.offset - self.speed * (1 - alpha)) % self.tile)
+
+
+class WorldPainter:
+    """
+    Draws simulation.World on any surface without sprites
+    (used for pixel observations and headless replays)
+    """
+
+    def __init__(self, time_of_day="day", color="yellow"):
+        self.background = ASSETS.image(f"data/sprites/back_ground/{time_of_day}.png")
+        self.ground = ScrollingLayer(
+            {"day": "data/sprites/ground/ground.png"}, GROUND_Y, SPEED
+        )
+        self.down_pipe = ASSETS.image(f"data/sprites/pipes/{time_of_day}.png")
+        self.up_pipe = ASSETS.image(
+            f"data/sprites/pipes/{time_of_day}.png", flip=(False, True)
+        )
+        self.bird = get_animation("birds/" + color)
+        self.coin = get_animation("coins", 4)
+
+    def draw(self, surface: pygame.Surface, world: World):
+        surface.blit(self.background, (0, 0))
+
+        coin_frame = world.frame // FRAME_TICKS % self.coin.count
+        coin_image = self.coin.frames[coin_frame]
+        coin_width = self.coin.sizes[coin_frame][0]
+        for coin in world.coins:
+            x_pos = int(coin.x) + COIN_SIZE // 2 - coin_width // 2
+            surface.blit(coin_image, (x_pos, int(coin.y)))
+
+        for pipe in world.pipes:
+            x_pos = int(pipe.x)
+            surface.blit(self.down_pipe, (x_pos, pipe.gap_y))
+            surface.blit(
+                self.up_pipe, (x_pos, pipe.gap_y - pipe.skylight - PIPE_HEIGHT)
+            )
+
+        bird_frame = world.frame // FRAME_TICKS % self.bird.count
+        surface.blit(self.bird.frames[bird_frame], (BIRD_X, int(world.bird_y)))
+
+        self.ground.scroll_to(world.distance)
+        surface.blit(self.ground.image, self.ground.rect)
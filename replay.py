@@ -0,0 +1,281 @@
+import argparse
+import struct
+import time
+
+from course import CURVES
+from simulation import World
+
+MAGIC = b"FBREC"
+VERSION = 4
+HEADER = struct.Struct("<5sB")
+# Seed, curve, time of day, color, crashed, frames, score, coins, number of jumps
+EPISODE = struct.Struct("<IBBBBIIII")
+CURVE_NAMES = tuple(CURVES)
+TIMES = ("day", "night")
+COLORS = ("yellow", "blue", "red")
+# Frames between snapshots made while replaying (for seeking)
+SNAPSHOT_EVERY = 600
+
+
+def write_varint(f, value: int):
+    """
+    Writes unsigned LEB128 number
+    """
+    data = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return f.write(data)
+
+
+def read_varint(f) -> int:
+    value = shift = 0
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise EOFError("Recording is cut in the middle of episode")
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+class Episode:
+    """
+    One game: seed of the course and world frames when player jumped.
+    Game starts with a jump before the first frame
+    """
+
+    def __init__(self, seed, time_of_day="day", color="yellow", curve="classic"):
+        self.seed = seed
+        self.curve = curve  # Difficulty curve of course
+        self.time_of_day = time_of_day
+        self.color = color
+        self.jumps = []
+        self.frames = 0  # Frames played
+        self.score = 0
+        self.coins = 0
+        self.crashed = False
+
+    def __repr__(self):
+        return (
+            f"Episode(seed {self.seed}, {self.curve}, {self.frames} frames, score {self.score}, "
+            f"{len(self.jumps)} jumps)"
+        )
+
+
+class Recorder:
+    """
+    Writes episodes to binary file as they end: header per episode and
+    jump frames as varint deltas (1-2 bytes per jump)
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.episode = None
+
+    def start(self, seed: int, time_of_day: str, color: str, curve="classic"):
+        self.episode = Episode(seed, time_of_day, color, curve)
+
+    def jump(self, frame: int):
+        """
+        Records jump made before world step from frame
+        """
+        if self.episode is not None:
+            self.episode.jumps.append(frame)
+
+    def finish(self, world: World):
+        """
+        Writes current episode with the result of world
+        """
+        episode = self.episode
+        if episode is None:
+            return
+        self.episode = None
+        episode.frames = world.frame
+        episode.score = world.score
+        episode.coins = world.collected
+        episode.crashed = not world.alive
+        self.file.write(
+            EPISODE.pack(
+                episode.seed,
+                CURVE_NAMES.index(episode.curve),
+                TIMES.index(episode.time_of_day),
+                COLORS.index(episode.color),
+                episode.crashed,
+                episode.frames,
+                episode.score,
+                episode.coins,
+                len(episode.jumps),
+            )
+        )
+        previous = 0
+        for frame in episode.jumps:
+            write_varint(self.file, frame - previous)
+            previous = frame
+        self.file.flush()
+
+    def close(self, world=None):
+        """
+        Writes unfinished episode (if world is given) and closes file
+        """
+        if world is not None:
+            self.finish(world)
+        self.file.close()
+
+
+def load(path: str) -> list:
+    """
+    Returns list of episodes from recording
+    """
+    episodes = []
+    with open(path, "rb") as f:
+        magic, version = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a recording of version {VERSION}")
+        while True:
+            data = f.read(EPISODE.size)
+            if not data:
+                return episodes
+            if len(data) < EPISODE.size:
+                raise EOFError("Recording is cut in the middle of episode")
+            seed, curve, time_of_day, color, crashed, frames, score, coins, jumps = (
+                EPISODE.unpack(data)
+            )
+            episode = Episode(
+                seed, TIMES[time_of_day], COLORS[color], CURVE_NAMES[curve]
+            )
+            episode.crashed = bool(crashed)
+            episode.frames = frames
+            episode.score = score
+            episode.coins = coins
+            frame = 0
+            for _ in range(jumps):
+                frame += read_varint(f)
+                episode.jumps.append(frame)
+            episodes.append(episode)
+
+
+class Playback:
+    """
+    Episodes fed to the rendered game instead of keyboard
+    """
+
+    def __init__(self, episodes: list):
+        self.episodes = list(episodes)
+        self.index = -1
+        self.jumps = set()
+
+    @property
+    def episode(self):
+        if 0 <= self.index < len(self.episodes):
+            return self.episodes[self.index]
+        return None
+
+    def next(self):
+        """
+        Returns next episode or None after the last one
+        """
+        self.index += 1
+        episode = self.episode
+        self.jumps = set(episode.jumps) if episode is not None else set()
+        return episode
+
+    def jump(self, frame: int) -> bool:
+        return frame in self.jumps
+
+
+class EpisodeReplay:
+    """
+    Headless replay of episode at full speed. Snapshots of the world are
+    kept every snapshot_every frames, so seek() steps from the nearest one
+    """
+
+    def __init__(self, episode: Episode, snapshot_every=SNAPSHOT_EVERY):
+        self.episode = episode
+        self.jumps = set(episode.jumps)
+        self.snapshot_every = snapshot_every
+        self.world = World(episode.seed, curve=episode.curve)
+        self.snapshots = {}  # Frame -> World.snapshot()
+        self.rewind()
+
+    def rewind(self):
+        self.world.reset(self.episode.seed)
+        self.world.jump()
+        self.snapshots[0] = self.world.snapshot()
+
+    def run(self, frame=None) -> World:
+        """
+        Steps until frame (or the end of episode) and returns world
+        """
+        world = self.world
+        last = self.episode.frames if frame is None else frame
+        while world.alive and world.frame < last:
+            world.step(world.frame in self.jumps)
+            if world.frame % self.snapshot_every == 0:
+                self.snapshots.setdefault(world.frame, world.snapshot())
+        return world
+
+    def seek(self, frame: int) -> World:
+        """
+        Returns world at frame restored from the nearest earlier snapshot
+        """
+        nearest = max(f for f in self.snapshots if f <= frame)
+        if not nearest <= self.world.frame <= frame:
+            self.world.restore(self.snapshots[nearest])
+        return self.run(frame)
+
+    def matches(self) -> bool:
+        """
+        Checks that finished replay ended like the recorded game
+        """
+        world = self.world
+        return (
+            world.frame == self.episode.frames
+            and world.score == self.episode.score
+            and world.collected == self.episode.coins
+            and world.alive != self.episode.crashed
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded games headless")
+    parser.add_argument("path", help="file written by main.py --record")
+    parser.add_argument("--episode", type=int, help="replay only this episode")
+    parser.add_argument("--seek", type=int, metavar="FRAME", help="print world state")
+    args = parser.parse_args()
+
+    episodes = load(args.path)
+    numbers = range(len(episodes)) if args.episode is None else [args.episode]
+    frames = 0
+    mismatches = 0
+    start = time.perf_counter()
+    for number in numbers:
+        replay = EpisodeReplay(episodes[number])
+        if args.seek is not None:
+            world = replay.seek(args.seek)
+            print(
+                f"#{number} frame {world.frame}: bird y {world.bird_y:.2f}, "
+                f"velocity {world.velocity:.2f}, score {world.score}, "
+                f"coins {world.collected}, alive {world.alive}"
+            )
+            continue
+        world = replay.run()
+        frames += world.frame
+        ok = replay.matches()
+        mismatches += not ok
+        print(f"#{number} {episodes[number]} {'ok' if ok else 'MISMATCH'}")
+    seconds = time.perf_counter() - start
+    if args.seek is None:
+        print(f"{frames} frames in {seconds:.2f} s ({frames / seconds:.0f} frames/s)")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from simulation import BIRD_HEIGHT, World
+
+
+class ThresholdPolicy:
+    """
+    Jumps when bird falls below top of next gap plus offset
+    """
+
+    def __init__(self, offset=60, max_velocity=0.5):
+        self.offset = offset
+        self.max_velocity = max_velocity
+
+    def __call__(self, world: World) -> bool:
+        pipe = world.next_pipe()
+        if pipe is None:
+            return False
+        target = pipe.gap_y - pipe.skylight + self.offset
+        return world.bird_y + BIRD_HEIGHT // 2 > target and (
+            world.velocity < self.max_velocity
+        )
+
+    def __repr__(self):
+        return f"ThresholdPolicy({self.offset}, {self.max_velocity})"
+
+
+def run_episode(seed, policy, max_frames=100000) -> tuple:
+    """
+    Returns score, survived frames and coins of one seeded run
+    """
+    world = World(seed)
+    while world.alive and world.frame < max_frames:
+        world.step(policy(world))
+    return world.score, world.frame, world.collected
+
+
+class Summary:
+    """
+    Aggregated results of many episodes
+    """
+
+    def __init__(self):
+        self.episodes = 0
+        self.scores = Counter()  # Score -> number of episodes
+        self.frames = 0
+        self.min_frames = None
+        self.max_frames = 0
+        self.coins = 0
+
+    def add(self, score, frames, coins):
+        self.episodes += 1
+        self.scores[score] += 1
+        self.frames += frames
+        self.coins += coins
+        self.max_frames = max(self.max_frames, frames)
+        if self.min_frames is None or frames < self.min_frames:
+            self.min_frames = frames
+
+    def merge(self, other: "Summary"):
+        self.episodes += other.episodes
+        self.scores.update(other.scores)
+        self.frames += other.frames
+        self.coins += other.coins
+        self.max_frames = max(self.max_frames, other.max_frames)
+        if other.min_frames is not None and (
+            self.min_frames is None or other.min_frames < self.min_frames
+        ):
+            self.min_frames = other.min_frames
+
+    def mean_score(self) -> float:
+        if not self.episodes:
+            return 0.0
+        return sum(s * n for s, n in self.scores.items()) / self.episodes
+
+    def percentile(self, q: float) -> int:
+        """
+        Returns score which q part of episodes did not exceed
+        """
+        rank = q * self.episodes
+        seen = 0
+        for score in sorted(self.scores):
+            seen += self.scores[score]
+            if seen >= rank:
+                return score
+        return 0
+
+    def __repr__(self):
+        if not self.episodes:
+            return "Summary(0 episodes)"
+        return (
+            f"Summary({self.episodes} episodes, mean score {self.mean_score():.2f}, "
+            f"p50 {self.percentile(0.5)}, p99 {self.percentile(0.99)}, "
+            f"max {max(self.scores)}, "
+            f"frames {self.min_frames}..{self.max_frames}, coins {self.coins})"
+        )
+
+
+# Read-only data sent to every worker once instead of with every chunk
+_shared = {}
+
+
+def _init_worker(seeds, policies, max_frames):
+    _shared["seeds"] = seeds
+    _shared["policies"] = policies
+    _shared["max_frames"] = max_frames
+
+
+def _run_chunk(policy_index, start, stop) -> tuple:
+    summary = Summary()
+    policy = _shared["policies"][policy_index]
+    for seed in _shared["seeds"][start:stop]:
+        summary.add(*run_episode(seed, policy, _shared["max_frames"]))
+    return policy_index, summary
+
+
+class EpisodeRunner:
+    """
+    Runs seeded episodes for every policy on a pool of processes.
+    Seeds are split into chunks, results come back as per-chunk summaries
+    """
+
+    def __init__(
+        self, seeds, policies, workers=None, chunk_size=256, max_frames=100000
+    ):
+        self.seeds = list(seeds)
+        self.policies = list(policies)
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.max_frames = max_frames
+
+    def stream(self):
+        """
+        Yields (policy index, updated summary of that policy) per finished chunk
+        """
+        summaries = [Summary() for _ in self.policies]
+        with ProcessPoolExecutor(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(self.seeds, self.policies, self.max_frames),
+        ) as pool:
+            futures = [
+                pool.submit(_run_chunk, index, start, start + self.chunk_size)
+                for index in range(len(self.policies))
+                for start in range(0, len(self.seeds), self.chunk_size)
+            ]
+            for future in as_completed(futures):
+                index, summary = future.result()
+                summaries[index].merge(summary)
+                yield index, summaries[index]
+
+    def run(self) -> list:
+        """
+        Returns list of summaries, one per policy
+        """
+        summaries = [Summary() for _ in self.policies]
+        for index, summary in self.stream():
+            summaries[index] = summary
+        return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Flappy Bird episodes")
+    parser.add_argument("--episodes", type=int, default=10000)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=256)
+    parser.add_argument("--max-frames", type=int, default=100000)
+    parser.add_argument(
+        "--offsets",
+        type=int,
+        nargs="+",
+        default=[60],
+        help="evaluate ThresholdPolicy with every offset",
+    )
+    args = parser.parse_args()
+
+    seeds = range(args.first_seed, args.first_seed + args.episodes)
+    policies = [ThresholdPolicy(offset) for offset in args.offsets]
+    runner = EpisodeRunner(seeds, policies, args.workers, args.chunk, args.max_frames)
+    for index, summary in runner.stream():
+        print(policies[index], summary, flush=True)
+
+
+if __name__ == "__main__":
+    main()
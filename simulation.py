@@ -0,0 +1,329 @@
+import copy
+
+from course import SKYLIGHT, SPEED, Course
+
+# World.step moves everything by one tick of TICK seconds
+TICK_RATE = 60
+TICK = 1 / TICK_RATE
+
+# Bird physics
+GRAVITY = 0.1
+JUMP_VELOCITY = 2
+CEILING_VELOCITY = -15 * GRAVITY  # Bird bounces down from top of screen
+
+# Sizes of sprites (pixels)
+SCREEN_WIDTH = 288
+SCREEN_HEIGHT = 512
+GROUND_Y = 400
+BIRD_WIDTH = 34
+BIRD_HEIGHT = 24
+BIRD_X = 144 - BIRD_WIDTH // 2
+BIRD_START_Y = 256 - BIRD_HEIGHT // 2
+PIPE_WIDTH = 52
+PIPE_HEIGHT = 320
+PIPE_CAP_HEIGHT = 24  # Pipe body is narrower than its cap
+PIPE_BODY_INSET = 2
+COIN_SIZE = 24
+
+# Course (pipes themselves come from course.Course)
+SCORE_X = 144  # Pipe gives a point when it passes this x
+FIRST_PIPE_X = 300
+PIPES_AHEAD = 5  # Pipes kept in the world ahead of bird
+
+# Filled columns [left, right) of every row of bird images: union of masks
+# of all animation frames (wings of frames 2-4 reach further left than
+# frame 1), so the shape is never smaller than the drawn bird
+BIRD_SHAPE = (
+    ((12, 24),) * 2
+    + ((8, 26),) * 2
+    + ((6, 28),) * 2
+    + ((2, 30),) * 2
+    + ((0, 30),) * 4
+    + ((0, 32),) * 2
+    + ((0, 34),) * 2
+    + ((0, 32),) * 4
+    + ((2, 30),) * 2
+    + ((10, 20),) * 2
+)
+
+
+class Pipe:
+    """
+    Pair of pipes: gap_y is top of lower pipe, gap is skylight pixels high.
+    World moves with speed of the nearest pipe which is not passed yet
+    """
+
+    __slots__ = ("x", "gap_y", "skylight", "speed", "used", "coin", "removed")
+
+    def __init__(self, x_pos, gap_y, skylight=SKYLIGHT, speed=SPEED):
+        self.x = x_pos
+        self.gap_y = gap_y
+        self.skylight = skylight
+        self.speed = speed
+        self.used = False
+        self.coin = None
+        self.removed = False
+
+
+class Coin:
+    __slots__ = ("x", "y", "removed")
+
+    def __init__(self, x_pos, y_pos):
+        self.x = x_pos
+        self.y = y_pos
+        self.removed = False
+
+
+class StepResult:
+    """
+    What happened during one step of the world
+    """
+
+    __slots__ = ("scored", "coins", "crashed", "spawned")
+
+    def __init__(self):
+        self.scored = 0
+        self.coins = []
+        self.crashed = False
+        self.spawned = []
+
+
+def bird_hits_pipe(bird_y, pipe: "Pipe") -> bool:
+    """
+    Checks bird shape against caps and bodies of both pipes
+    """
+    left = int(pipe.x)
+    right = left + PIPE_WIDTH
+    if right <= BIRD_X or left >= BIRD_X + BIRD_WIDTH:
+        return False
+    body_left = left + PIPE_BODY_INSET
+    body_right = right - PIPE_BODY_INSET
+    gap_top = pipe.gap_y - pipe.skylight
+    gap_bottom = pipe.gap_y
+    return (
+        bird_hits_rect(bird_y, left, gap_top - PIPE_CAP_HEIGHT, right, gap_top)
+        or bird_hits_rect(bird_y, left, gap_bottom, right, gap_bottom + PIPE_CAP_HEIGHT)
+        or bird_hits_rect(
+            bird_y,
+            body_left,
+            gap_top - PIPE_HEIGHT,
+            body_right,
+            gap_top - PIPE_CAP_HEIGHT,
+        )
+        or bird_hits_rect(
+            bird_y,
+            body_left,
+            gap_bottom + PIPE_CAP_HEIGHT,
+            body_right,
+            gap_bottom + PIPE_HEIGHT,
+        )
+    )
+
+
+def bird_hits_rect(bird_y, left, top, right, bottom) -> bool:
+    """
+    Checks bird shape against rectangle [left, right) x [top, bottom)
+    """
+    bird_top = int(bird_y)
+    if right <= BIRD_X or left >= BIRD_X + BIRD_WIDTH:
+        return False
+    first = max(0, top - bird_top)
+    last = min(BIRD_HEIGHT, bottom - bird_top)
+    for row in range(first, last):
+        row_left, row_right = BIRD_SHAPE[row]
+        if BIRD_X + row_left < right and BIRD_X + row_right > left:
+            return True
+    return False
+
+
+class World:
+    """
+    Display-free game state: bird, pipes and coins as plain numbers.
+    With collide=False the world only moves things and the caller reports
+    crashes and coins itself (the renderer checks them with the same tests
+    after moving its sprites).
+    """
+
+    def __init__(self, seed=None, collide=True, curve="classic"):
+        self.course = Course(seed, curve)
+        self.collide = collide
+        self.reset(self.course.seed)
+
+    def reset(self, seed=None):
+        """
+        Starts new run, same seed gives the same course (without seed the
+        next course of the current one is played)
+        """
+        self.course.reset(seed)
+        self.bird_y = BIRD_START_Y
+        self.previous_y = BIRD_START_Y  # Bird height before last step
+        self.velocity = 0
+        self.pipes = []
+        self.coins = []
+        self.score = 0
+        self.collected = 0
+        self.frame = 0
+        self.distance = 0  # Pixels scrolled
+        self.alive = True
+        self.spawn_pipe(FIRST_PIPE_X)
+        while len(self.pipes) < PIPES_AHEAD:
+            self.spawn_pipe()
+        self.ahead = self.pipes[0].speed  # Speed of the next step
+        self.speed = self.ahead  # Speed of the last step
+
+    def snapshot(self) -> tuple:
+        """
+        Returns copy of whole state (random generator too) for restore()
+        """
+        return (
+            self.bird_y,
+            self.previous_y,
+            self.velocity,
+            self.score,
+            self.collected,
+            self.frame,
+            self.distance,
+            self.speed,
+            self.ahead,
+            self.alive,
+            copy.deepcopy((self.pipes, self.coins)),
+            self.course.snapshot(),
+        )
+
+    def restore(self, snapshot: tuple):
+        """
+        Returns world to the state of snapshot (it can be restored again)
+        """
+        (
+            self.bird_y,
+            self.previous_y,
+            self.velocity,
+            self.score,
+            self.collected,
+            self.frame,
+            self.distance,
+            self.speed,
+            self.ahead,
+            self.alive,
+            objects,
+            course,
+        ) = snapshot
+        self.pipes, self.coins = copy.deepcopy(objects)
+        self.course.restore(course)
+
+    def spawn_pipe(self, x_pos=None) -> Pipe:
+        """
+        Adds pipe of the next segment of course behind the last pipe
+        """
+        segment = self.course.take()
+        if x_pos is None:
+            x_pos = self.pipes[-1].x + segment.spacing
+        pipe = Pipe(x_pos, segment.gap_y, segment.skylight, segment.speed)
+        if segment.coin:
+            pipe.coin = Coin(x_pos - 23, pipe.gap_y - pipe.skylight // 2 - 12)
+            self.coins.append(pipe.coin)
+        self.pipes.append(pipe)
+        return pipe
+
+    def jump(self):
+        self.velocity = JUMP_VELOCITY
+
+    def next_pipe(self):
+        """
+        Returns nearest pipe which bird has not passed yet
+        """
+        for pipe in self.pipes:
+            if pipe.x + PIPE_WIDTH >= BIRD_X:
+                return pipe
+        return None
+
+    def next_speed(self) -> float:
+        """
+        Returns speed of the nearest pipe which has not given a point yet
+        """
+        for pipe in self.pipes:
+            if not pipe.used:
+                return pipe.speed
+        return self.speed
+
+    def crash(self):
+        self.alive = False
+
+    def take_coin(self, coin: Coin):
+        if not coin.removed:
+            coin.removed = True
+            self.coins.remove(coin)
+            self.collected += 1
+
+    def step(self, action=False) -> StepResult:
+        """
+        Moves world one frame forward, action means jump
+        """
+        result = StepResult()
+        if not self.alive:
+            result.crashed = True
+            return result
+        self.frame += 1
+        if action:
+            self.jump()
+        speed = self.speed = self.ahead
+        self.distance += speed
+
+        self.previous_y = self.bird_y
+        self.velocity -= GRAVITY
+        if self.bird_y <= 0:
+            self.velocity = CEILING_VELOCITY
+        self.bird_y -= self.velocity
+
+        pipes = self.pipes
+        while pipes and pipes[0].x < -PIPE_WIDTH:
+            pipes.pop(0).removed = True
+        for pipe in pipes:
+            if not pipe.used and pipe.x < SCORE_X:
+                pipe.used = True
+                result.scored += 1
+            pipe.x -= speed
+        for _ in range(result.scored):  # New pipe goes behind the others
+            result.spawned.append(self.spawn_pipe())
+        if result.scored:
+            self.ahead = self.next_speed()
+        self.score += result.scored
+
+        coins = self.coins
+        while coins and coins[0].x < -COIN_SIZE:
+            coins.pop(0).removed = True
+        for coin in coins:
+            coin.x -= speed
+
+        if self.collide:
+            self.check_collisions(result)
+        return result
+
+    def touched_coins(self) -> list:
+        """
+        Returns coins which bird touches now
+        """
+        touched = []
+        for coin in self.coins:
+            if coin.x >= BIRD_X + BIRD_WIDTH:
+                break
+            left, top = int(coin.x), int(coin.y)
+            if bird_hits_rect(
+                self.bird_y, left, top, left + COIN_SIZE, top + COIN_SIZE
+            ):
+                touched.append(coin)
+        return touched
+
+    def check_collisions(self, result: StepResult):
+        bird_top = int(self.bird_y)
+        crashed = bird_top + BIRD_HEIGHT > GROUND_Y
+        for pipe in self.pipes:
+            if pipe.x >= BIRD_X + BIRD_WIDTH or crashed:
+                break
+            crashed = bird_hits_pipe(self.bird_y, pipe)
+        result.coins = self.touched_coins()
+        for coin in result.coins:
+            self.take_coin(coin)
+        if crashed:
+            self.crash()
+            result.crashed = True
@@ -0,0 +1,181 @@
+import json
+import os
+import pickle
+import threading
+
+SAVE_PATH = "data/save.json"
+# Pickled tuple of old versions, migrated on first load
+LEGACY_PATH = "data/data.fbd"
+VERSION = 1
+COLORS = ("yellow", "blue", "red")  # Birds of shop, in order of shop_bought
+
+
+class SaveData:
+    """
+    Progress of player
+    """
+
+    def __init__(
+        self, high_score=0, coins=0, color="yellow", shop_bought=(True, False, False)
+    ):
+        self.high_score = high_score
+        self.coins = coins
+        self.color = color
+        self.shop_bought = list(shop_bought)  # Yellow, blue and red birds
+
+    def to_dict(self) -> dict:
+        return {
+            "version": VERSION,
+            "high_score": self.high_score,
+            "coins": self.coins,
+            "color": self.color,
+            "shop_bought": list(self.shop_bought),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SaveData":
+        """
+        Returns data of save file, ValueError if it has wrong shape or types
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Save is {type(data).__name__}, not object")
+        if data.get("version") != VERSION:
+            raise ValueError(f"Unknown save version {data.get('version')}")
+        for field in ("high_score", "coins"):
+            value = data.get(field)
+            if type(value) is not int or value < 0:
+                raise ValueError(f"Wrong {field} {value!r}")
+        if data.get("color") not in COLORS:
+            raise ValueError(f"Unknown color {data.get('color')!r}")
+        bought = data.get("shop_bought")
+        if (
+            not isinstance(bought, list)
+            or len(bought) != len(COLORS)
+            or not all(type(flag) is bool for flag in bought)
+        ):
+            raise ValueError(f"Wrong shop_bought {bought!r}")
+        return cls(data["high_score"], data["coins"], data["color"], bought)
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    Writes file through temporary one, so it is never left half-written
+    """
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+class SaveStore:
+    """
+    Loads and saves SaveData. save() only keeps a copy, a write-behind
+    thread writes the latest copy at most once per interval seconds
+    """
+
+    def __init__(self, path=SAVE_PATH, legacy_path=LEGACY_PATH, interval=1.0):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.interval = interval
+        self.pending = None  # Latest data which is not written yet
+        self.lock = threading.Lock()  # Guards pending
+        self.write_lock = threading.Lock()  # One writer of file at a time
+        self.dirty = threading.Event()
+        self.closing = threading.Event()
+        self.thread = None
+        self.error = None  # Last failed write of writer thread
+        self.saves = 0
+        self.writes = 0
+
+    def load(self) -> SaveData:
+        """
+        Returns saved data. Pickle of old versions is migrated only when
+        there is no save yet, damaged save gives default data (it is
+        written at once, so the pickle is not migrated again next time)
+        """
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, "rb") as f:
+                    return SaveData.from_dict(json.loads(f.read()))
+            except (ValueError, KeyError) as error:
+                print(f"Файл сохранения '{self.path}' повреждён: {error}")
+                os.replace(self.path, self.path + ".corrupt")
+            data = SaveData()
+            self.write(data)
+            return data
+        if os.path.isfile(self.legacy_path):
+            try:
+                with open(self.legacy_path, "rb") as f:
+                    fields = pickle.load(f)
+                if not isinstance(fields, (tuple, list)) or len(fields) != 4:
+                    raise ValueError(f"Expected 4 fields, got {fields!r}")
+                data = SaveData.from_dict(SaveData(*fields).to_dict())
+            except (pickle.UnpicklingError, EOFError, TypeError, ValueError) as error:
+                print(f"Старое сохранение '{self.legacy_path}' повреждено: {error}")
+            else:
+                self.write(data)
+                return data
+        return SaveData()
+
+    def write(self, data: SaveData):
+        """
+        Writes data right now on the calling thread
+        """
+        encoded = json.dumps(data.to_dict(), separators=(",", ":")).encode()
+        with self.write_lock:
+            write_atomic(self.path, encoded)
+            self.writes += 1
+
+    def save(self, data: SaveData):
+        """
+        Schedules writing of data (cheap, never touches disk)
+        """
+        with self.lock:
+            self.pending = SaveData(**vars(data))
+            self.saves += 1
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="storage")
+            self.thread.daemon = True
+            self.thread.start()
+        self.dirty.set()
+
+    def _run(self):
+        while not self.closing.is_set():
+            self.dirty.wait()
+            self.dirty.clear()
+            try:
+                self.flush()
+            except OSError as error:  # Kept for the next flush on main thread
+                if self.error is None:  # Once until a write succeeds
+                    print(f"Не удалось записать '{self.path}': {error}")
+                self.error = error
+            self.closing.wait(self.interval)
+
+    def flush(self):
+        """
+        Writes pending data now
+        """
+        with self.lock:
+            data, self.pending = self.pending, None
+        if data is not None:
+            try:
+                self.write(data)
+            except OSError:
+                with self.lock:
+                    if self.pending is None:
+                        self.pending = data
+                raise
+        self.error = None
+
+    def close(self):
+        """
+        Stops writer thread and writes what is left
+        """
+        self.closing.set()
+        self.dirty.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
@@ -0,0 +1,119 @@
+import os
+from collections import OrderedDict
+
+import pygame
+
+from assets import ASSETS
+
+
+class LRUCache:
+    """
+    Dict which keeps size last used values
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, make):
+        """
+        Returns cached value of key or stores result of make()
+        """
+        value = self.items.get(key)
+        if value is not None:
+            self.hits += 1
+            self.items.move_to_end(key)
+            return value
+        self.misses += 1
+        value = self.items[key] = make()
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "items": len(self.items)}
+
+
+def aligned(image: pygame.Surface, pos, align: str) -> tuple:
+    """
+    Returns top left corner of image anchored at pos by its left, center
+    or right side
+    """
+    x_pos, y_pos = pos
+    if align == "center":
+        x_pos -= image.get_width() // 2
+    elif align == "right":
+        x_pos -= image.get_width()
+    return x_pos, y_pos
+
+
+class NumberRenderer:
+    """
+    Numbers composed from digit sprites of data/sprites/<prefix> into one
+    cached surface per value
+    """
+
+    def __init__(self, prefix="nums", size=64):
+        self.prefix = prefix
+        self.glyphs = {}  # Digit images are loaded by the first render
+        self.cache = LRUCache(size)
+
+    def compose(self, text: str) -> pygame.Surface:
+        if not self.glyphs:
+            self.glyphs = {
+                os.path.basename(path)[0]: ASSETS.image(path)
+                for path in ASSETS.frames(self.prefix)
+            }
+        glyphs = [self.glyphs[char] for char in text]
+        width = sum(glyph.get_width() for glyph in glyphs)
+        height = max(glyph.get_height() for glyph in glyphs)
+        colorkey = glyphs[0].get_colorkey()
+        if colorkey is None:
+            surface = pygame.Surface((width, height), pygame.SRCALPHA, 32)
+        else:  # Keep fast colorkey blits of digit sprites
+            surface = pygame.Surface((width, height), 0, glyphs[0])
+            surface.fill(colorkey)
+            surface.set_colorkey(colorkey)
+        x_pos = 0
+        for glyph in glyphs:
+            surface.blit(glyph, (x_pos, 0))
+            x_pos += glyph.get_width()
+        return surface
+
+    def render(self, value) -> pygame.Surface:
+        """
+        Returns surface of number (do not draw on it)
+        """
+        text = str(value)
+        return self.cache.get(text, lambda: self.compose(text))
+
+    def draw(self, surface: pygame.Surface, value, pos, align="left"):
+        image = self.render(value)
+        surface.blit(image, aligned(image, pos, align))
+
+
+class TextCache:
+    """
+    Font.render results cached by text and colors
+    """
+
+    def __init__(self, font: pygame.font.Font, size=64):
+        self.font = font
+        self.cache = LRUCache(size)
+
+    def render(
+        self, text: str, antialias: bool, color, background=None
+    ) -> pygame.Surface:
+        """
+        Same as Font.render, but returns shared surface (do not draw on it)
+        """
+        key = (text, antialias, tuple(color), background and tuple(background))
+        return self.cache.get(
+            key, lambda: self.font.render(text, antialias, color, background)
+        )
+
+    def draw(self, surface: pygame.Surface, text: str, color, pos, align="left"):
+        image = self.render(text, False, color)
+        surface.blit(image, aligned(image, pos, align))